@@ -0,0 +1,199 @@
+"""Background purge of a user's data after an account deletion request.
+
+Deletion is tracked as a document in the `deletion_jobs` collection so that it
+can report progress and be resumed by any worker after a crash or restart.
+"""
+from app.db import db, client
+from app.routes.ai import clear_user_chat_history
+from app.cache import user_cache, project_list_cache
+from app.permissions import invalidate_access
+from app.trash import owner_query, attachment_ids, release_attachments
+from pymongo import ReturnDocument
+from datetime import datetime, timedelta
+import asyncio
+import logging
+import secrets
+
+logger = logging.getLogger(__name__)
+
+# Collections purged in order; the user document itself is removed last
+PURGE_COLLECTIONS = ["tasks", "projects", "project_members", "tags", "notifications", "chat_history", "activity"]
+PURGE_BATCH_SIZE = 500
+# A worker holds a job for this long without progress before another may take it over
+JOB_LEASE = timedelta(minutes=5)
+# How often each worker looks for jobs whose lease has run out (their owner crashed or was restarted)
+JOB_RECHECK_INTERVAL = 60
+# A failed job is retried after JOB_RETRY_BACKOFF, doubling each time, and left failed after MAX_JOB_ATTEMPTS
+JOB_RETRY_BACKOFF = timedelta(minutes=1)
+MAX_JOB_ATTEMPTS = 5
+
+# Strong references to running jobs so they are not garbage collected mid-purge
+_running = {}
+
+
+async def _supports_transactions() -> bool:
+    try:
+        hello = await client.admin.command("hello")
+    except Exception:
+        return False
+    return bool(hello.get("setName") or hello.get("msg") == "isdbgrid")
+
+
+async def _delete_batch(collection: str, ids: list, use_transaction: bool) -> int:
+    if not use_transaction:
+        result = await db[collection].delete_many({"_id": {"$in": ids}})
+        return result.deleted_count
+    async with await client.start_session() as session:
+        async with session.start_transaction():
+            result = await db[collection].delete_many({"_id": {"$in": ids}}, session=session)
+            return result.deleted_count
+
+
+async def _purge_project_memberships(job_id: str, user_id):
+    """Remove other users' memberships in the user's projects (live or trashed) before the projects go."""
+    project_ids = await db["projects"].distinct("_id", owner_query("projects", user_id))
+    if not project_ids:
+        return
+    member_ids = await db["project_members"].distinct("user_id", {"project_id": {"$in": project_ids}})
+    result = await db["project_members"].delete_many({"project_id": {"$in": project_ids}})
+    await db["deletion_jobs"].update_one(
+        {"_id": job_id},
+        {"$inc": {"progress.project_members": result.deleted_count}, "$set": {"updated_at": datetime.utcnow()}}
+    )
+    await invalidate_access(member_ids)
+
+
+async def create_deletion_job(user_id) -> dict:
+    """Mark the user as deleting and record a pending purge job."""
+    now = datetime.utcnow()
+    job = {
+        "_id": secrets.token_urlsafe(16),
+        "user_id": user_id,
+        "status": "pending",
+        "progress": {name: 0 for name in PURGE_COLLECTIONS},
+        "error": None,
+        "attempts": 0,
+        "created_at": now,
+        "updated_at": now,
+    }
+    await db["deletion_jobs"].insert_one(job)
+    await db["users"].update_one(
+        {"_id": user_id},
+        {"$set": {"deleting": True, "deletion_job_id": job["_id"]}}
+    )
+    # Other workers must stop accepting the user's tokens right away
+    await user_cache.invalidate(str(user_id))
+    return job
+
+
+async def run_deletion_job(job_id: str):
+    """Purge all collections for the job's user in bounded batches.
+
+    Progress is persisted after every batch, so re-running a job picks up
+    wherever the previous attempt stopped.
+    """
+    now = datetime.utcnow()
+    # Claim the job atomically so only one worker purges it at a time
+    job = await db["deletion_jobs"].find_one_and_update(
+        {"_id": job_id, "status": {"$ne": "completed"}, **_claimable(now)},
+        {"$set": {"status": "running", "lease_until": now + JOB_LEASE, "updated_at": now},
+         "$inc": {"attempts": 1}, "$unset": {"next_attempt_at": ""}},
+        return_document=ReturnDocument.AFTER
+    )
+    if not job:
+        return
+    user_id = job["user_id"]
+    use_transaction = await _supports_transactions()
+    try:
+        await _purge_project_memberships(job_id, user_id)
+        for collection in PURGE_COLLECTIONS:
+            while True:
+                # Stored files follow the tasks that reference them, not the uploader
+                projection = {"_id": 1, "attachments.id": 1} if collection == "tasks" else {"_id": 1}
+                cursor = db[collection].find(owner_query(collection, user_id), projection).limit(PURGE_BATCH_SIZE)
+                docs = await cursor.to_list(PURGE_BATCH_SIZE)
+                if not docs:
+                    break
+                deleted = await _delete_batch(collection, [doc["_id"] for doc in docs], use_transaction)
+                if collection == "tasks":
+                    await release_attachments(attachment_ids(docs))
+                await db["deletion_jobs"].update_one(
+                    {"_id": job_id},
+                    {
+                        "$inc": {f"progress.{collection}": deleted},
+                        "$set": {"updated_at": datetime.utcnow(), "lease_until": datetime.utcnow() + JOB_LEASE},
+                    }
+                )
+                # Let request handlers run between batches
+                await asyncio.sleep(0)
+        clear_user_chat_history(str(user_id))
+        await db["users"].delete_one({"_id": user_id})
+        await user_cache.invalidate(str(user_id))
+        await project_list_cache.invalidate(str(user_id))
+        await db["deletion_jobs"].update_one(
+            {"_id": job_id},
+            {"$set": {"status": "completed", "updated_at": datetime.utcnow(), "completed_at": datetime.utcnow()},
+             "$unset": {"lease_until": ""}}
+        )
+        logger.info(f"Deletion job {job_id} completed for user {user_id}")
+    except Exception as e:
+        update = {"status": "failed", "error": str(e), "updated_at": datetime.utcnow()}
+        if job["attempts"] < MAX_JOB_ATTEMPTS:
+            update["next_attempt_at"] = datetime.utcnow() + JOB_RETRY_BACKOFF * 2 ** (job["attempts"] - 1)
+            logger.error(f"Deletion job {job_id} failed (attempt {job['attempts']}), retrying at {update['next_attempt_at']}: {e}")
+        else:
+            logger.error(f"Deletion job {job_id} failed {job['attempts']} times, giving up: {e}")
+        await db["deletion_jobs"].update_one({"_id": job_id}, {"$set": update, "$unset": {"lease_until": ""}})
+
+
+def start_deletion_job(job_id: str):
+    """Schedule a purge on the running event loop (no-op if already running here)."""
+    if job_id in _running:
+        return _running[job_id]
+    task = asyncio.create_task(run_deletion_job(job_id))
+    _running[job_id] = task
+    task.add_done_callback(lambda _: _running.pop(job_id, None))
+    return task
+
+
+def _claimable(now: datetime) -> dict:
+    """Jobs no live worker holds a lease on, that are due for a retry and have attempts left."""
+    return {
+        "attempts": {"$not": {"$gte": MAX_JOB_ATTEMPTS}},
+        "$and": [
+            {"$or": [{"lease_until": {"$exists": False}}, {"lease_until": {"$lt": now}}]},
+            {"$or": [{"next_attempt_at": {"$exists": False}}, {"next_attempt_at": {"$lte": now}}]},
+        ],
+    }
+
+
+async def resume_deletion_jobs():
+    """Restart unfinished jobs that are claimable (see `_claimable`)."""
+    cursor = db["deletion_jobs"].find({
+        "status": {"$in": ["pending", "running", "failed"]},
+        **_claimable(datetime.utcnow()),
+    }, {"_id": 1})
+    async for job in cursor:
+        if job["_id"] not in _running:
+            logger.info(f"Resuming deletion job {job['_id']}")
+            start_deletion_job(job["_id"])
+
+
+async def watch_deletion_jobs():
+    """Resume orphaned jobs at startup and again whenever a crashed worker's lease expires.
+
+    A quick restart can come back while the previous process's lease is still
+    valid, so one check at startup is not enough.
+    """
+    while True:
+        try:
+            await resume_deletion_jobs()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.warning(f"Could not check for deletion jobs to resume: {e}")
+        await asyncio.sleep(JOB_RECHECK_INTERVAL)
+
+
+async def get_deletion_job(job_id: str):
+    return await db["deletion_jobs"].find_one({"_id": job_id})
@@ -0,0 +1,112 @@
+"""Activity / audit trail written off the request path.
+
+Routes call `record_activity()`, which only appends to a bounded in-memory
+queue. A background task drains the queue and writes events with
+`insert_many` in batches. When the queue is full, the oldest event is
+dropped (and counted) instead of blocking the request.
+"""
+from app.db import db
+from app.metrics import ACTIVITY_EVENTS_DROPPED
+from datetime import datetime
+import asyncio
+import logging
+
+logger = logging.getLogger(__name__)
+
+ACTIVITY_QUEUE_SIZE = 10000
+FLUSH_BATCH_SIZE = 500
+# Seconds to wait for more events before flushing a partial batch
+FLUSH_INTERVAL = 1.0
+
+
+class ActivityWriter:
+    def __init__(self, maxsize: int = ACTIVITY_QUEUE_SIZE):
+        self._queue = asyncio.Queue(maxsize=maxsize)
+        self._task = None
+        # Events taken off the queue but not yet handed to a write; kept here so stop() can flush them
+        self._batch = []
+        self._inflight = None
+
+    def emit(self, event: dict):
+        try:
+            self._queue.put_nowait(event)
+        except asyncio.QueueFull:
+            # Drop-oldest: recent activity is worth more than a stale backlog
+            self._queue.get_nowait()
+            self._queue.put_nowait(event)
+            ACTIVITY_EVENTS_DROPPED.inc()
+
+    async def _collect(self, batch: list):
+        """Fill `batch` in place, so events already dequeued survive a cancellation."""
+        batch.append(await self._queue.get())
+        deadline = asyncio.get_running_loop().time() + FLUSH_INTERVAL
+        while len(batch) < FLUSH_BATCH_SIZE:
+            timeout = deadline - asyncio.get_running_loop().time()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+
+    async def _write(self, batch: list):
+        try:
+            await db["activity"].insert_many(batch, ordered=False)
+        except Exception as e:
+            ACTIVITY_EVENTS_DROPPED.inc(len(batch))
+            logger.error(f"Failed to write {len(batch)} activity events: {e}")
+
+    async def _run(self):
+        while True:
+            await self._collect(self._batch)
+            batch, self._batch = self._batch, []
+            # Shielded so stopping never interrupts an insert halfway; stop() waits for it instead
+            self._inflight = asyncio.ensure_future(self._write(batch))
+            await asyncio.shield(self._inflight)
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Stop the writer and flush the batch being collected and whatever is still queued."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._inflight is not None:
+            await self._inflight
+            self._inflight = None
+        batch, self._batch = self._batch, []
+        while batch or not self._queue.empty():
+            while not self._queue.empty() and len(batch) < FLUSH_BATCH_SIZE:
+                batch.append(self._queue.get_nowait())
+            await self._write(batch)
+            batch = []
+
+
+activity_writer = ActivityWriter()
+
+
+def record_activity(user_id, action: str, entity: str, entity_id=None, changes: dict = None):
+    """Queue an activity event; never blocks and never raises into the caller."""
+    activity_writer.emit({
+        "user_id": user_id,
+        "action": action,
+        "entity": entity,
+        "entity_id": entity_id,
+        "changes": changes or {},
+        "created_at": datetime.utcnow(),
+    })
+
+
+def diff_fields(before: dict, after: dict) -> dict:
+    """Fields whose value changed, as {field: {"from": old, "to": new}}."""
+    return {
+        key: {"from": before.get(key), "to": value}
+        for key, value in after.items()
+        if before.get(key) != value
+    }
@@ -0,0 +1,82 @@
+"""Lazily loaded ML models for the AI routes.
+
+sentence-transformers and faiss are slow to import and load. Importing them
+at module level would delay every worker's boot. The models are instead
+loaded in a background thread after startup when `settings.ai_warmup` is
+enabled, and CRUD routes serve traffic in the meantime. AI routes check
+`status` and fall back to the rule-based responses until the models are
+ready, or for good when loading is disabled.
+"""
+from app.config import settings
+from typing import List, Optional
+import asyncio
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class SemanticMatcher:
+    """Maps free-form mentor questions to the closest known question by embedding similarity."""
+
+    def __init__(self):
+        self.status = "not_loaded"
+        self.error = None
+        self.load_seconds = None
+        self._task = None
+        self._model = None
+        self._index = None
+        self._keys: List[str] = []
+
+    def _load(self, keys: List[str]):
+        # Heavy imports happen here, off the event loop and after the app is serving
+        import faiss
+        from sentence_transformers import SentenceTransformer
+
+        model = SentenceTransformer(settings.ai_embedding_model)
+        embeddings = model.encode(keys, normalize_embeddings=True, convert_to_numpy=True).astype("float32")
+        index = faiss.IndexFlatIP(embeddings.shape[1])
+        index.add(embeddings)
+        self._model, self._index, self._keys = model, index, keys
+
+    async def _warm_up(self, keys: List[str]):
+        self.status = "loading"
+        started = time.perf_counter()
+        try:
+            await asyncio.to_thread(self._load, keys)
+            self.status = "ready"
+            self.load_seconds = round(time.perf_counter() - started, 2)
+            logger.info(f"Semantic matcher ready in {self.load_seconds}s")
+        except Exception as e:
+            self.status = "failed"
+            self.error = str(e)
+            logger.warning(f"Semantic matcher unavailable, using exact matching only: {e}")
+
+    def start(self, keys: List[str]):
+        """Begin loading in the background; safe to call more than once."""
+        if self._task is None:
+            self._task = asyncio.create_task(self._warm_up(keys))
+        return self._task
+
+    def _match(self, text: str) -> Optional[str]:
+        vector = self._model.encode([text], normalize_embeddings=True, convert_to_numpy=True).astype("float32")
+        scores, ids = self._index.search(vector, 1)
+        if scores[0][0] >= settings.ai_match_threshold:
+            return self._keys[ids[0][0]]
+        return None
+
+    async def match(self, text: str) -> Optional[str]:
+        if self.status != "ready":
+            return None
+        return await asyncio.to_thread(self._match, text)
+
+    def health(self) -> dict:
+        return {
+            "status": self.status,
+            "model": settings.ai_embedding_model,
+            "load_seconds": self.load_seconds,
+            "error": self.error,
+        }
+
+
+semantic_matcher = SemanticMatcher()
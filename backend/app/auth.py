@@ -5,8 +5,13 @@ from fastapi import HTTPException, status, Depends, Request
 from fastapi.security import OAuth2PasswordBearer
 from app.db import db
 from app.models import User
+from app.metrics import BCRYPT_SECONDS, record_cache
+from app.cache import user_cache
 from bson import ObjectId
+from collections import OrderedDict
+import hashlib
 import os
+import time
 from dotenv import load_dotenv
 import logging
 
@@ -17,12 +22,17 @@ SECRET_KEY = os.getenv("SECRET_KEY", "your-secret-key-please-change-in-productio
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 60 * 24  # 1 day instead of 1 week
 
+# Bounded LRU of decoded claims for recently seen tokens
+CLAIMS_CACHE_SIZE = 10000
+_claims_cache = OrderedDict()
+
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/auth/login")
 
 def verify_password(plain_password, hashed_password):
     try:
-        return pwd_context.verify(plain_password, hashed_password)
+        with BCRYPT_SECONDS.labels("verify").time():
+            return pwd_context.verify(plain_password, hashed_password)
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -31,7 +41,8 @@ def verify_password(plain_password, hashed_password):
 
 def get_password_hash(password):
     try:
-        return pwd_context.hash(password)
+        with BCRYPT_SECONDS.labels("hash").time():
+            return pwd_context.hash(password)
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -39,6 +50,7 @@ def get_password_hash(password):
         )
 
 def create_access_token(data: dict, expires_delta: timedelta = None):
+    """Create a signed JWT. Include `ver` (the user's token_version) so it can be revoked."""
     try:
         to_encode = data.copy()
         expire = datetime.utcnow() + (expires_delta or timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES))
@@ -50,52 +62,62 @@ def create_access_token(data: dict, expires_delta: timedelta = None):
             detail="Error creating access token"
         )
 
+def _claims_key(token: str) -> bytes:
+    return hashlib.sha256(token.encode()).digest()
+
+def decode_access_token(token: str) -> dict:
+    """Decode and verify a JWT, reusing claims of recently verified tokens.
+
+    Entries live in a bounded LRU keyed by the token's SHA-256 and are only
+    served until the token's own `exp`, so caching never extends validity.
+    """
+    key = _claims_key(token)
+    cached = _claims_cache.get(key)
+    if cached is not None:
+        if cached["exp"] > time.time():
+            _claims_cache.move_to_end(key)
+            record_cache("jwt_claims", True)
+            return cached
+        del _claims_cache[key]
+    record_cache("jwt_claims", False)
+    payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+    if isinstance(payload.get("exp"), (int, float)):
+        _claims_cache[key] = payload
+        if len(_claims_cache) > CLAIMS_CACHE_SIZE:
+            _claims_cache.popitem(last=False)
+    return payload
+
 async def get_current_user(request: Request, token: str = Depends(oauth2_scheme)):
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
-    
-    # Try to get token from Authorization header first
+
+    # Try to get token from Authorization header first, then the cookie
     auth_header = request.headers.get("Authorization")
-    logging.info(f"Auth header: {auth_header}")
-    
     if auth_header and auth_header.startswith("Bearer "):
-        token = auth_header.split(" ", 1)[1]
-        logging.info(f"Token from header: {token}")
-        logging.info(f"Token segments: {token.split('.')}")  # Log token segments
+        token = auth_header[7:]
     elif not token:
-        # If no token in header, try cookie
         cookie_token = request.cookies.get("token")
-        logging.info(f"Cookie token: {cookie_token}")
-        
         if cookie_token and cookie_token.startswith("Bearer "):
-            token = cookie_token.split(" ", 1)[1]
-            logging.info(f"Token from cookie (with Bearer): {token}")
-            logging.info(f"Token segments: {token.split('.')}")  # Log token segments
+            token = cookie_token[7:]
         else:
-            logging.error("Invalid token format in cookie")
             raise credentials_exception
-    
+
     if not token:
-        logging.error("No token found in request")
         raise credentials_exception
-        
+
     try:
-        logging.info(f"Attempting to decode token: {token}")
-        logging.info(f"Token length: {len(token)}")
-        logging.info(f"Token segments count: {len(token.split('.'))}")
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+        payload = decode_access_token(token)
         user_id = payload.get("sub")
         if user_id is None:
-            logging.error("No user_id in token payload")
             raise credentials_exception
-        logging.info(f"Successfully decoded token for user_id: {user_id}")
     except JWTError as e:
-        logging.error(f"JWTError: {e}")
-        logging.error(f"Token format: {token}")  # Log the problematic token
+        logging.debug(f"Rejected access token: {e}")
         raise credentials_exception
+    except HTTPException:
+        raise
     except Exception as e:
         logging.error(f"Token processing error: {e}")
         raise HTTPException(
@@ -103,14 +125,25 @@ async def get_current_user(request: Request, token: str = Depends(oauth2_scheme)
             detail="Error processing token"
         )
     try:
-        user = await db["users"].find_one({"_id": ObjectId(user_id)})
-        if user is None:
-            logging.error("User not found in DB")
+        user = await user_cache.get_or_load(
+            user_id, lambda: db["users"].find_one({"_id": ObjectId(user_id)})
+        )
+        if user is None or user.get("deleting"):
+            raise credentials_exception
+        # Tokens issued before the last logout/password change carry an older version
+        if payload.get("ver", 0) != user.get("token_version", 0):
             raise credentials_exception
         return user
+    except HTTPException:
+        raise
     except Exception as e:
         logging.error(f"User fetch error: {e}")
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="Error fetching user data"
-        ) 
\ No newline at end of file
+        )
+
+async def revoke_user_tokens(user_id):
+    """Invalidate every token issued to the user so far by bumping its token version."""
+    await db["users"].update_one({"_id": user_id}, {"$inc": {"token_version": 1}})
+    await user_cache.invalidate(str(user_id))
@@ -0,0 +1,165 @@
+"""In-process async caches kept coherent across uvicorn workers.
+
+Each `AsyncTTLCache` is a size-bounded LRU with per-entry TTL and single-flight
+loading: concurrent misses for the same key share one loader call. Each worker
+process has its own copy. `invalidate()` drops the entry locally and
+publishes the key to the `cache_invalidations` capped collection. Every worker
+tails that collection and evicts the keys published by other workers.
+"""
+from app.db import db
+from app.metrics import record_cache
+from collections import OrderedDict
+from pymongo import CursorType
+from pymongo.errors import CollectionInvalid
+from datetime import datetime
+import asyncio
+import logging
+import time
+import uuid
+
+logger = logging.getLogger(__name__)
+
+INVALIDATION_COLLECTION = "cache_invalidations"
+INVALIDATION_COLLECTION_BYTES = 1024 * 1024
+# Identifies this process so it ignores its own broadcasts
+WORKER_ID = uuid.uuid4().hex
+
+_caches = {}
+
+
+class AsyncTTLCache:
+    def __init__(self, name: str, maxsize: int = 1024, ttl: float = 60.0):
+        self.name = name
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._inflight = {}
+        # Bumped on every invalidation so loads that raced with one are not stored
+        self._generation = 0
+        _caches[name] = self
+
+    def get(self, key):
+        entry = self._data.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at < time.monotonic():
+            del self._data[key]
+            return None
+        self._data.move_to_end(key)
+        return value
+
+    def set(self, key, value):
+        self._data[key] = (time.monotonic() + self.ttl, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    async def get_or_load(self, key, loader):
+        """Return the cached value or await `loader()` once for all concurrent callers.
+
+        `None` results are not cached.
+        """
+        value = self.get(key)
+        if value is not None:
+            record_cache(self.name, True)
+            return value
+        record_cache(self.name, False)
+        while (pending := self._inflight.get(key)) is not None:
+            try:
+                return await asyncio.shield(pending)
+            except asyncio.CancelledError:
+                if not pending.cancelled():
+                    # This caller was cancelled, not the load it was waiting for
+                    raise
+                # The loading caller was cancelled (e.g. client disconnect); take the load over
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        generation = self._generation
+        try:
+            value = await loader()
+        except Exception as e:
+            future.set_exception(e)
+            # Mark the exception as retrieved when nobody else was waiting
+            future.exception()
+            raise
+        except BaseException:
+            # Cancelled mid-load: release the waiters so one of them retries
+            future.cancel()
+            raise
+        finally:
+            self._inflight.pop(key, None)
+        if value is not None and generation == self._generation:
+            self.set(key, value)
+        future.set_result(value)
+        return value
+
+    def discard(self, key=None):
+        """Drop one key (or everything) from this process only."""
+        self._generation += 1
+        if key is None:
+            self._data.clear()
+        else:
+            self._data.pop(key, None)
+
+    async def invalidate(self, key=None):
+        """Drop a key (or everything) here and in every other worker."""
+        self.discard(key)
+        try:
+            await db[INVALIDATION_COLLECTION].insert_one({
+                "cache": self.name,
+                "key": key,
+                "origin": WORKER_ID,
+                "at": datetime.utcnow(),
+            })
+        except Exception as e:
+            # Other workers converge once the TTL expires
+            logger.warning(f"Could not broadcast invalidation for {self.name}:{key}: {e}")
+
+
+def clear_all():
+    for cache in _caches.values():
+        cache.discard()
+
+
+async def _ensure_invalidation_collection():
+    try:
+        await db.create_collection(INVALIDATION_COLLECTION, capped=True, size=INVALIDATION_COLLECTION_BYTES)
+        # A tailable cursor on an empty capped collection dies immediately
+        await db[INVALIDATION_COLLECTION].insert_one({"cache": None, "key": None, "origin": WORKER_ID, "at": datetime.utcnow()})
+    except CollectionInvalid:
+        pass
+
+
+async def listen_for_invalidations():
+    """Tail the capped collection and apply invalidations from other workers."""
+    last_id = None
+    while True:
+        try:
+            if last_id is None:
+                await _ensure_invalidation_collection()
+                # Start from the newest entry; older broadcasts predate our caches
+                last = await db[INVALIDATION_COLLECTION].find_one(sort=[("$natural", -1)])
+                last_id = last["_id"] if last else None
+            query = {"_id": {"$gt": last_id}} if last_id else {}
+            cursor = db[INVALIDATION_COLLECTION].find(query, cursor_type=CursorType.TAILABLE_AWAIT)
+            while cursor.alive:
+                async for doc in cursor:
+                    last_id = doc["_id"]
+                    cache = _caches.get(doc.get("cache"))
+                    if cache is not None and doc.get("origin") != WORKER_ID:
+                        cache.discard(doc.get("key"))
+                await asyncio.sleep(0.1)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.warning(f"Cache invalidation listener error: {e}")
+        # Broadcasts may have been missed while the cursor was down
+        clear_all()
+        await asyncio.sleep(1)
+
+
+# Shared caches used by the routes
+user_cache = AsyncTTLCache("users", maxsize=10000, ttl=60)
+project_list_cache = AsyncTTLCache("project_lists", maxsize=5000, ttl=60)
@@ -0,0 +1,52 @@
+from pydantic_settings import BaseSettings, SettingsConfigDict
+
+
+class Settings(BaseSettings):
+    """Application settings, read from the environment and the `.env` file."""
+
+    model_config = SettingsConfigDict(env_file=".env", extra="ignore")
+
+    # Database
+    mongodb_url: str = "mongodb://localhost:27017"
+    database_name: str = "tasksphere"
+
+    # Connection pool and timeouts (milliseconds)
+    mongo_max_pool_size: int = 100
+    mongo_min_pool_size: int = 10
+    mongo_max_idle_time_ms: int = 300000
+    mongo_server_selection_timeout_ms: int = 5000
+    mongo_connect_timeout_ms: int = 5000
+    mongo_socket_timeout_ms: int = 20000
+    mongo_wait_queue_timeout_ms: int = 2000
+
+    # Read preference used by list routes, which tolerate slightly stale data
+    mongo_list_read_preference: str = "secondaryPreferred"
+
+    # Attachments
+    max_attachment_bytes: int = 25 * 1024 * 1024
+    max_attachments_per_task: int = 20
+
+    # Per-user quotas and input limits
+    quota_max_tasks: int = 10000
+    max_task_document_bytes: int = 64 * 1024
+    max_tags_per_task: int = 20
+    max_description_length: int = 10000
+
+    # Query guards: largest page a list route returns and server-side time limit for queries
+    max_page_size: int = 500
+    mongo_query_timeout_ms: int = 5000
+
+    # Trashed tasks and projects are purged after this many days (app.trash.sweep_trash)
+    trash_retention_days: int = 30
+
+    # AI models: opt-in, since each worker downloads and loads them (torch, faiss) in the background
+    # after startup, and paraphrased mentor questions then get the canned answer of the closest match
+    ai_warmup: bool = False
+    ai_embedding_model: str = "all-MiniLM-L6-v2"
+    ai_match_threshold: float = 0.8
+
+    # Readiness probe timeout (seconds)
+    readiness_timeout: float = 2.0
+
+
+settings = Settings()
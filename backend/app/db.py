@@ -1,7 +1,129 @@
+"""MongoDB client lifecycle.
+
+The client is created and closed by the FastAPI lifespan (see `app.main`).
+Modules import `db`, `read_db` and `client` at import time; these are proxies
+that forward to whatever client is currently connected.
+"""
 from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import ReadPreference
+from app.config import settings
+from app.metrics import mongo_listeners
+import asyncio
+import logging
+
+logger = logging.getLogger(__name__)
+
+READ_PREFERENCES = {
+    "primary": ReadPreference.PRIMARY,
+    "primaryPreferred": ReadPreference.PRIMARY_PREFERRED,
+    "secondary": ReadPreference.SECONDARY,
+    "secondaryPreferred": ReadPreference.SECONDARY_PREFERRED,
+    "nearest": ReadPreference.NEAREST,
+}
+
+
+class _Filter(dict):
+    """A query filter shared by many modules, read-only so no caller can change it for the others."""
+
+    def _read_only(self, *args, **kwargs):
+        raise TypeError("Shared query filters are read-only; copy with {**filter} to extend")
+
+    __setitem__ = __delitem__ = __ior__ = clear = pop = popitem = setdefault = update = _read_only
+
+    def __reduce__(self):
+        # Copies (e.g. deepcopy by drivers) are plain dicts
+        return dict, (dict(self),)
+
+
+# Soft-delete filters (see app.trash). Live documents store deleted_at: null explicitly,
+# which is what the partial indexes on live data are defined over.
+ACTIVE = _Filter(deleted_at=_Filter({"$type": "null"}))
+TRASHED = _Filter(deleted_at=_Filter({"$type": "date"}))
+
+_state = {"client": None, "db": None, "read_db": None}
+
+
+class _Proxy:
+    """Forwards attribute and item access to the currently connected object."""
+
+    def __init__(self, key: str):
+        self._key = key
+
+    def _target(self):
+        target = _state[self._key]
+        if target is None:
+            raise RuntimeError("MongoDB client is not connected")
+        return target
+
+    def __getattr__(self, name):
+        return getattr(self._target(), name)
+
+    def __getitem__(self, name):
+        return self._target()[name]
+
+
+client = _Proxy("client")
+db = _Proxy("db")
+# Database handle for list/stats routes, reading from secondaries when available
+read_db = _Proxy("read_db")
+
+
+def create_client() -> AsyncIOMotorClient:
+    return AsyncIOMotorClient(
+        settings.mongodb_url,
+        maxPoolSize=settings.mongo_max_pool_size,
+        minPoolSize=settings.mongo_min_pool_size,
+        maxIdleTimeMS=settings.mongo_max_idle_time_ms,
+        serverSelectionTimeoutMS=settings.mongo_server_selection_timeout_ms,
+        connectTimeoutMS=settings.mongo_connect_timeout_ms,
+        socketTimeoutMS=settings.mongo_socket_timeout_ms,
+        waitQueueTimeoutMS=settings.mongo_wait_queue_timeout_ms,
+        event_listeners=mongo_listeners(),
+    )
+
+
+def get_database():
+    """The connected Motor database itself, for APIs that reject proxies (e.g. GridFS)."""
+    return db._target()
+
+
+def is_connected() -> bool:
+    return _state["client"] is not None
+
+
+def connect(mongo_client=None, database_name: str = None):
+    """Install a client (a new one from settings unless one is given)."""
+    mongo_client = mongo_client or create_client()
+    name = database_name or settings.database_name
+    read_preference = READ_PREFERENCES.get(settings.mongo_list_read_preference, ReadPreference.PRIMARY)
+    _state["client"] = mongo_client
+    _state["db"] = mongo_client[name]
+    _state["read_db"] = mongo_client.get_database(name, read_preference=read_preference)
+    return _state["db"]
+
+
+def close():
+    if _state["client"] is not None:
+        _state["client"].close()
+    _state.update(client=None, db=None, read_db=None)
+
+
+async def warm_up():
+    """Open `minPoolSize` connections up front so first requests skip the handshake."""
+    try:
+        await asyncio.gather(*(
+            _state["client"].admin.command("ping")
+            for _ in range(max(1, settings.mongo_min_pool_size))
+        ))
+        logger.info("MongoDB connection pool warmed up")
+    except Exception as e:
+        logger.warning(f"MongoDB warm-up failed: {e}")
 
-MONGO_URL = "mongodb://localhost:27017"
-DB_NAME = "tasksphere"
 
-client = AsyncIOMotorClient(MONGO_URL)
-db = client[DB_NAME] 
\ No newline at end of file
+async def ping() -> bool:
+    try:
+        await asyncio.wait_for(_state["client"].admin.command("ping"), timeout=settings.readiness_timeout)
+        return True
+    except Exception as e:
+        logger.warning(f"MongoDB ping failed: {e}")
+        return False
@@ -0,0 +1,67 @@
+"""Index definitions, created idempotently at startup."""
+from app.db import db
+from app.config import settings
+from app.trash import ACTIVE, TRASHED, backfill_deleted_at
+from app.tags import build_tag_catalogue
+from pymongo.errors import OperationFailure
+import logging
+
+logger = logging.getLogger(__name__)
+
+INDEX_OPTIONS_CONFLICT = 85
+
+
+async def _ensure_ttl_index(collection: str, expire_after_seconds: int):
+    """TTL purge of trashed documents; a changed retention period is applied with collMod."""
+    name = "deleted_at_ttl"
+    try:
+        await db[collection].create_index(
+            [("deleted_at", 1)], name=name, expireAfterSeconds=expire_after_seconds, partialFilterExpression=TRASHED
+        )
+    except OperationFailure as e:
+        if e.code != INDEX_OPTIONS_CONFLICT:
+            raise
+        await db.command("collMod", collection, index={"name": name, "expireAfterSeconds": expire_after_seconds})
+
+
+async def ensure_indexes():
+    try:
+        # Partial indexes below only match documents with an explicit deleted_at: null
+        await backfill_deleted_at()
+        # Membership lookups: "projects I belong to" and "members of a project"
+        await db["project_members"].create_index([("user_id", 1), ("project_id", 1)])
+        await db["project_members"].create_index([("project_id", 1), ("user_id", 1)], unique=True)
+        # Branches of the task access filter ($or of owner / assignee / shared project), live tasks only.
+        # The trailing _id lets the task list merge the branches in _id order for its cursor.
+        await db["tasks"].create_index([("user_id", 1), ("_id", -1)], name="user_id_id_active", partialFilterExpression=ACTIVE)
+        await db["tasks"].create_index([("assignee_ids", 1), ("_id", -1)], name="assignee_ids_id_active", partialFilterExpression=ACTIVE)
+        await db["tasks"].create_index([("project_id", 1), ("_id", -1)], name="project_id_id_active", partialFilterExpression=ACTIVE)
+        await db["projects"].create_index([("user_id", 1)], name="user_id_active", partialFilterExpression=ACTIVE)
+        # "My tasks tagged X" (multikey on tags)
+        await db["tasks"].create_index([("user_id", 1), ("tags", 1)], name="user_id_tags_active", partialFilterExpression=ACTIVE)
+        # Tag catalogue: prefix autocomplete in name order and most used tags
+        await db["tags"].create_index([("user_id", 1), ("name", 1)], unique=True)
+        await db["tags"].create_index([("user_id", 1), ("count", -1)])
+        # Trash listings: what a user owns or deleted, newest first
+        await db["tasks"].create_index([("user_id", 1), ("deleted_at", -1)], name="user_id_trashed", partialFilterExpression=TRASHED)
+        await db["tasks"].create_index([("deleted_by", 1), ("deleted_at", -1)], name="deleted_by_trashed", partialFilterExpression=TRASHED)
+        await db["tasks"].create_index([("deleted_with", 1)], sparse=True)
+        await db["projects"].create_index([("user_id", 1), ("deleted_at", -1)], name="user_id_trashed", partialFilterExpression=TRASHED)
+        # app.trash.sweep_trash purges at the retention period and releases attachment files;
+        # the TTL a day later only catches what the sweep missed
+        retention = (settings.trash_retention_days + 1) * 24 * 3600
+        for collection in ("tasks", "projects", "project_members"):
+            await _ensure_ttl_index(collection, retention)
+        # $graphLookup traversals for subtask trees and dependency cycle checks
+        await db["tasks"].create_index([("parent_id", 1)])
+        await db["tasks"].create_index([("blocked_by", 1)])
+        # Paginated activity feed, newest first
+        await db["activity"].create_index([("user_id", 1), ("_id", -1)])
+        # "Is this stored file still referenced?" check when an attachment is removed
+        await db["tasks"].create_index([("attachments.id", 1)], sparse=True)
+        # Content-hash dedup lookups for attachment uploads
+        await db["attachments.files"].create_index([("metadata.user_id", 1), ("metadata.sha256", 1)])
+        # Needs the unique (user_id, name) index above for its $merge
+        await build_tag_catalogue()
+    except Exception as e:
+        logger.warning(f"Could not create indexes: {e}")
@@ -3,12 +3,49 @@ from dotenv import load_dotenv
 # Load environment variables early
 load_dotenv()
 
-from fastapi import FastAPI
+import asyncio
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
-from app.routes import auth, users, tasks, projects, ai
+from fastapi.responses import JSONResponse
+from app.routes import auth, users, tasks, projects, ai, transfer, metrics, attachments, activity, trash, tags
 from app.routes.ai import RequestLoggingMiddleware
+from app.account_deletion import watch_deletion_jobs
+from app.trash import sweep_trash
+from app.indexes import ensure_indexes
+from app.cache import listen_for_invalidations
+from app.activity import activity_writer
+from app.ai_models import semantic_matcher
+from app.routes.ai import SPECIFIC_QA_RESPONSES
+from app.metrics import MetricsMiddleware, POOL_STATS
+from app.config import settings
+from pymongo.errors import ExecutionTimeout
+from app import db as database
 
-app = FastAPI()
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # A client may already be installed (e.g. by the benchmark harness); only manage our own
+    owns_client = not database.is_connected()
+    if owns_client:
+        database.connect()
+    await database.warm_up()
+    await ensure_indexes()
+    deletion_watcher = asyncio.create_task(watch_deletion_jobs())
+    invalidation_listener = asyncio.create_task(listen_for_invalidations())
+    trash_sweeper = asyncio.create_task(sweep_trash())
+    activity_writer.start()
+    if settings.ai_warmup:
+        # Loads in a background thread; requests are served while it runs
+        semantic_matcher.start(list(SPECIFIC_QA_RESPONSES))
+    yield
+    invalidation_listener.cancel()
+    trash_sweeper.cancel()
+    deletion_watcher.cancel()
+    await activity_writer.stop()
+    if owns_client:
+        database.close()
+
+app = FastAPI(lifespan=lifespan)
 
 # Configure CORS
 app.add_middleware(
@@ -17,18 +54,45 @@ app.add_middleware(
     allow_credentials=True,  # Allow credentials
     allow_methods=["*"],  # Allow all methods
     allow_headers=["*"],  # Allow all headers
+    expose_headers=["X-Next-Before"],  # Task list cursor
 )
 
 # Add request logging middleware
 app.add_middleware(RequestLoggingMiddleware)
 
+# Add Prometheus request metrics middleware
+app.add_middleware(MetricsMiddleware)
+
 # Include routers
 app.include_router(auth.router, prefix="/api/auth", tags=["auth"])
 app.include_router(users.router, prefix="/api/users", tags=["users"])
 app.include_router(tasks.router, prefix="/api/tasks", tags=["tasks"])
+app.include_router(attachments.router, prefix="/api/tasks", tags=["attachments"])
 app.include_router(projects.router, prefix="/api/projects", tags=["projects"])
 app.include_router(ai.router, prefix="/api/ai", tags=["ai"])
+app.include_router(tags.router, prefix="/api/tags", tags=["tags"])
+app.include_router(trash.router, prefix="/api/trash", tags=["trash"])
+app.include_router(activity.router, prefix="/api/activity", tags=["activity"])
+app.include_router(transfer.router, prefix="/api", tags=["transfer"])
+app.include_router(metrics.router, tags=["metrics"])
+
+@app.exception_handler(ExecutionTimeout)
+async def query_timeout_handler(request: Request, exc: ExecutionTimeout):
+    # A query hit MONGO_QUERY_TIMEOUT_MS; fail this request instead of holding a connection
+    return JSONResponse(status_code=503, content={"detail": "The query took too long, please narrow it down and retry"})
 
 @app.get("/")
 async def root():
-    return {"message": "Welcome to the To-Do API"} 
\ No newline at end of file
+    return {"message": "Welcome to the To-Do API"}
+
+@app.get("/ready")
+async def readiness():
+    """Readiness probe: MongoDB reachable and the connection pool not exhausted."""
+    mongo_ok = await database.ping()
+    pool = {**POOL_STATS, "max_pool_size": settings.mongo_max_pool_size}
+    saturated = POOL_STATS["checked_out"] >= settings.mongo_max_pool_size
+    ready = mongo_ok and not saturated
+    return JSONResponse(
+        status_code=200 if ready else 503,
+        content={"ready": ready, "mongodb": "ok" if mongo_ok else "unreachable", "pool": pool},
+    )
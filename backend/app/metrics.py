@@ -0,0 +1,176 @@
+"""Prometheus metrics for HTTP requests, MongoDB commands, pools, caches and bcrypt.
+
+When PROMETHEUS_MULTIPROC_DIR is set (required with several uvicorn workers),
+prometheus_client writes samples to that directory and `/metrics` aggregates
+them across all worker processes.
+"""
+from prometheus_client import Counter, Gauge, Histogram, CollectorRegistry, REGISTRY, generate_latest, multiprocess
+from pymongo import monitoring
+from starlette.middleware.base import BaseHTTPMiddleware
+from fastapi import Request, Response
+from typing import Callable
+import os
+import time
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.075, 0.1, 0.25, 0.5, 0.75, 1.0, 2.5, 5.0, 10.0)
+DB_LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+
+REQUEST_COUNT = Counter(
+    "http_requests_total",
+    "HTTP requests by route template, method and status code",
+    ["method", "route", "status"],
+)
+REQUEST_LATENCY = Histogram(
+    "http_request_duration_seconds",
+    "HTTP request latency by route template",
+    ["method", "route"],
+    buckets=LATENCY_BUCKETS,
+)
+MONGO_COMMAND_LATENCY = Histogram(
+    "mongodb_command_duration_seconds",
+    "MongoDB command latency by collection and command",
+    ["collection", "command"],
+    buckets=DB_LATENCY_BUCKETS,
+)
+MONGO_COMMAND_FAILURES = Counter(
+    "mongodb_command_failures_total",
+    "Failed MongoDB commands by collection and command",
+    ["collection", "command"],
+)
+MONGO_POOL_CONNECTIONS = Gauge(
+    "mongodb_pool_connections",
+    "MongoDB connection pool size by server and state (open/checked_out)",
+    ["address", "state"],
+    multiprocess_mode="livesum",
+)
+CACHE_REQUESTS = Counter(
+    "cache_requests_total",
+    "Cache lookups by cache name and result (hit/miss)",
+    ["cache", "result"],
+)
+BCRYPT_SECONDS = Histogram(
+    "bcrypt_duration_seconds",
+    "Time spent hashing or verifying passwords with bcrypt",
+    ["operation"],
+    buckets=(0.05, 0.1, 0.2, 0.3, 0.5, 0.75, 1.0, 2.0),
+)
+ACTIVITY_EVENTS_DROPPED = Counter(
+    "activity_events_dropped_total",
+    "Activity events dropped because the writer queue was full or the write failed",
+)
+
+# Commands that only concern the connection itself and would drown out real traffic
+IGNORED_COMMANDS = {"hello", "ismaster", "isMaster", "ping", "saslStart", "saslContinue", "endSessions"}
+
+
+# Per-process pool counters, used by the readiness probe
+POOL_STATS = {"open": 0, "checked_out": 0}
+
+
+def record_cache(cache: str, hit: bool):
+    CACHE_REQUESTS.labels(cache, "hit" if hit else "miss").inc()
+
+
+class MongoCommandMetrics(monitoring.CommandListener):
+    """Feeds per-collection/per-command timings into MONGO_COMMAND_LATENCY."""
+
+    def __init__(self):
+        # (connection_id, request_id) -> collection name; succeeded events lack the command body
+        self._collections = {}
+
+    def started(self, event):
+        if event.command_name in IGNORED_COMMANDS:
+            return
+        # getMore carries the cursor id under its own name and the collection separately
+        key = "collection" if event.command_name == "getMore" else event.command_name
+        target = event.command.get(key)
+        collection = target if isinstance(target, str) else event.database_name
+        self._collections[(event.connection_id, event.request_id)] = collection
+
+    def _finish(self, event):
+        return self._collections.pop((event.connection_id, event.request_id), None)
+
+    def succeeded(self, event):
+        collection = self._finish(event)
+        if collection is not None:
+            MONGO_COMMAND_LATENCY.labels(collection, event.command_name).observe(event.duration_micros / 1e6)
+
+    def failed(self, event):
+        collection = self._finish(event)
+        if collection is not None:
+            MONGO_COMMAND_LATENCY.labels(collection, event.command_name).observe(event.duration_micros / 1e6)
+            MONGO_COMMAND_FAILURES.labels(collection, event.command_name).inc()
+
+
+class MongoPoolMetrics(monitoring.ConnectionPoolListener):
+    """Tracks open and checked-out connections of the driver's pools."""
+
+    @staticmethod
+    def _track(event, state, delta):
+        host, port = event.address
+        POOL_STATS[state] += delta
+        MONGO_POOL_CONNECTIONS.labels(f"{host}:{port}", state).inc(delta)
+
+    def pool_created(self, event):
+        pass
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        pass
+
+    def pool_closed(self, event):
+        pass
+
+    def connection_created(self, event):
+        self._track(event, "open", 1)
+
+    def connection_ready(self, event):
+        pass
+
+    def connection_closed(self, event):
+        self._track(event, "open", -1)
+
+    def connection_check_out_started(self, event):
+        pass
+
+    def connection_check_out_failed(self, event):
+        pass
+
+    def connection_checked_out(self, event):
+        self._track(event, "checked_out", 1)
+
+    def connection_checked_in(self, event):
+        self._track(event, "checked_out", -1)
+
+
+def mongo_listeners():
+    """Event listeners to pass to the Mongo client."""
+    return [MongoCommandMetrics(), MongoPoolMetrics()]
+
+
+class MetricsMiddleware(BaseHTTPMiddleware):
+    """Records request count and latency labelled by route template, not raw path."""
+
+    async def dispatch(self, request: Request, call_next: Callable) -> Response:
+        start = time.perf_counter()
+        status_code = 500
+        try:
+            response = await call_next(request)
+            status_code = response.status_code
+            return response
+        finally:
+            route = request.scope.get("route")
+            # Unmatched paths share one label to keep cardinality bounded
+            template = getattr(route, "path", "unmatched")
+            REQUEST_LATENCY.labels(request.method, template).observe(time.perf_counter() - start)
+            REQUEST_COUNT.labels(request.method, template, str(status_code)).inc()
+
+
+def render_metrics() -> bytes:
+    if "PROMETHEUS_MULTIPROC_DIR" in os.environ:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry)
+    return generate_latest(REGISTRY)
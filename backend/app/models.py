@@ -36,6 +36,16 @@ class Project(BaseModel):
         arbitrary_types_allowed = True
         json_encoders = {ObjectId: str}
 
+class ProjectMember(BaseModel):
+    id: PyObjectId = Field(default_factory=PyObjectId, alias='_id')
+    project_id: PyObjectId
+    user_id: PyObjectId
+    role: str = "viewer"  # "editor" or "viewer"; the project owner is projects.user_id
+
+    class Config:
+        arbitrary_types_allowed = True
+        json_encoders = {ObjectId: str}
+
 class Task(BaseModel):
     id: PyObjectId = Field(default_factory=PyObjectId, alias='_id')
     title: str
@@ -46,7 +56,13 @@ class Task(BaseModel):
     project_id: Optional[PyObjectId] = None
     tags: Optional[List[str]] = []
     user_id: PyObjectId
-    attachments: Optional[List[str]] = []
+    assignee_ids: Optional[List[PyObjectId]] = []
+    parent_id: Optional[PyObjectId] = None
+    blocked_by: Optional[List[PyObjectId]] = []
+    subtask_count: int = 0
+    completed_subtask_count: int = 0
+    # Small references to files in the `attachments` GridFS bucket
+    attachments: Optional[List[dict]] = []
 
     class Config:
         arbitrary_types_allowed = True
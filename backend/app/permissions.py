@@ -0,0 +1,92 @@
+"""Project membership and task access checks.
+
+Projects are owned by `projects.user_id`; other users join through
+`project_members` documents with the role "editor" or "viewer". Each user's
+accessible-project map ({project_id: role}) is cached, so one lookup per
+request answers every access question, and list queries become a single `$in`.
+"""
+from fastapi import HTTPException
+from app.config import settings
+from app.db import db
+from app.cache import AsyncTTLCache, project_list_cache
+from app.trash import ACTIVE
+from bson import ObjectId
+
+ROLES = ("viewer", "editor", "owner")
+ROLE_RANK = {role: rank for rank, role in enumerate(ROLES, start=1)}
+
+# user id (str) -> {project id (str): role}
+membership_cache = AsyncTTLCache("memberships", maxsize=10000, ttl=60)
+
+
+async def _load_memberships(user_id) -> dict:
+    roles = {}
+    # Read from the primary: a lagging secondary would cache revoked or missing access for the whole TTL
+    async for member in db["project_members"].find(
+        {"user_id": user_id, **ACTIVE}, {"project_id": 1, "role": 1}, max_time_ms=settings.mongo_query_timeout_ms
+    ):
+        roles[str(member["project_id"])] = member["role"]
+    async for project in db["projects"].find(
+        {"user_id": user_id, **ACTIVE}, {"_id": 1}, max_time_ms=settings.mongo_query_timeout_ms
+    ):
+        roles[str(project["_id"])] = "owner"
+    return roles
+
+
+async def accessible_projects(user) -> dict:
+    return await membership_cache.get_or_load(str(user["_id"]), lambda: _load_memberships(user["_id"]))
+
+
+async def invalidate_access(user_ids):
+    """Forget cached memberships and project lists after a membership change."""
+    for user_id in user_ids:
+        await membership_cache.invalidate(str(user_id))
+        await project_list_cache.invalidate(str(user_id))
+
+
+def has_role(role, required: str) -> bool:
+    return ROLE_RANK.get(role, 0) >= ROLE_RANK[required]
+
+
+async def project_role(user, project_id):
+    return (await accessible_projects(user)).get(str(project_id))
+
+
+async def require_project_role(user, project_id, required: str):
+    role = await project_role(user, project_id)
+    if role is None:
+        raise HTTPException(status_code=404, detail="Project not found")
+    if not has_role(role, required):
+        raise HTTPException(status_code=403, detail="Not allowed")
+    return role
+
+
+async def task_role(user, task: dict):
+    """Effective role on a task: creator owns it, assignees may edit, else the project role."""
+    if task.get("user_id") == user["_id"]:
+        return "owner"
+    role = None
+    if task.get("project_id"):
+        role = await project_role(user, task["project_id"])
+    if user["_id"] in (task.get("assignee_ids") or []) and not has_role(role, "editor"):
+        role = "editor"
+    return role
+
+
+async def require_task_role(user, task: dict, required: str):
+    role = await task_role(user, task) if task else None
+    if role is None:
+        raise HTTPException(status_code=404, detail="Task not found")
+    if not has_role(role, required):
+        raise HTTPException(status_code=403, detail="Not allowed")
+    return role
+
+
+async def task_access_filter(user) -> dict:
+    """Query matching the user's own live tasks, tasks assigned to them and tasks in shared projects."""
+    project_ids = [ObjectId(project_id) for project_id in await accessible_projects(user)]
+    # Each branch repeats the live filter so it can use the matching partial index
+    clauses = [{"user_id": user["_id"], **ACTIVE}, {"assignee_ids": user["_id"], **ACTIVE}]
+    if project_ids:
+        clauses.append({"project_id": {"$in": project_ids}, **ACTIVE})
+    return {"$or": clauses}
@@ -0,0 +1,90 @@
+"""Per-user storage quotas.
+
+Each user document keeps a `usage.tasks` counter of the live tasks they
+created. Creates, imports, trash and restore reserve or release quota with a
+conditional `$inc`, so enforcing the limit never needs a count query on the
+write path. Users created before quotas existed get the counter initialised
+from one count query the first time it is needed. Tasks purged from the trash
+were already released when they were trashed.
+"""
+from fastapi import HTTPException, status
+from app.db import db, ACTIVE
+from app.config import settings
+import bson
+
+
+async def _initialize_usage(user_id) -> bool:
+    """Set `usage.tasks` from a count if it is missing; False if it already existed."""
+    if await db["users"].count_documents({"_id": user_id, "usage.tasks": {"$exists": True}}, limit=1):
+        return False
+    count = await db["tasks"].count_documents(
+        {"user_id": user_id, **ACTIVE}, maxTimeMS=settings.mongo_query_timeout_ms
+    )
+    await db["users"].update_one({"_id": user_id, "usage.tasks": {"$exists": False}}, {"$set": {"usage.tasks": count}})
+    return True
+
+
+async def try_reserve_tasks(user_id, count: int = 1) -> bool:
+    if count <= 0:
+        return True
+    for _ in range(2):
+        result = await db["users"].update_one(
+            {"_id": user_id, "usage.tasks": {"$lte": settings.quota_max_tasks - count}},
+            {"$inc": {"usage.tasks": count}}
+        )
+        if result.modified_count:
+            return True
+        if not await _initialize_usage(user_id):
+            return False
+    return False
+
+
+async def reserve_tasks(user_id, count: int = 1):
+    if not await try_reserve_tasks(user_id, count):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail=f"Task quota of {settings.quota_max_tasks} tasks reached"
+        )
+
+
+async def release_tasks(user_id, count: int = 1):
+    if count > 0:
+        await db["users"].update_one(
+            {"_id": user_id, "usage.tasks": {"$gte": count}}, {"$inc": {"usage.tasks": -count}}
+        )
+
+
+async def _tasks_per_owner(task_ids) -> dict:
+    groups = await db["tasks"].aggregate([
+        {"$match": {"_id": {"$in": list(task_ids)}}},
+        {"$group": {"_id": "$user_id", "count": {"$sum": 1}}},
+    ], maxTimeMS=settings.mongo_query_timeout_ms).to_list(None)
+    return {group["_id"]: group["count"] for group in groups}
+
+
+async def reserve_for_tasks(task_ids):
+    """Reserve quota for each creator of `task_ids` (a restore), all or nothing."""
+    reserved = []
+    for user_id, count in (await _tasks_per_owner(task_ids)).items():
+        if not await try_reserve_tasks(user_id, count):
+            for done_user_id, done_count in reserved:
+                await release_tasks(done_user_id, done_count)
+            raise HTTPException(
+                status_code=status.HTTP_403_FORBIDDEN,
+                detail=f"Task quota of {settings.quota_max_tasks} tasks reached"
+            )
+        reserved.append((user_id, count))
+
+
+async def release_for_tasks(task_ids):
+    for user_id, count in (await _tasks_per_owner(task_ids)).items():
+        await release_tasks(user_id, count)
+
+
+def ensure_document_size(doc: dict):
+    size = len(bson.encode(doc))
+    if size > settings.max_task_document_bytes:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"Task is {size} bytes; the limit is {settings.max_task_document_bytes}"
+        )
@@ -0,0 +1,33 @@
+from fastapi import APIRouter, Depends, HTTPException, Query
+from app.auth import get_current_user
+from app.config import settings
+from app.db import read_db
+from app.utils import to_jsonable
+from bson import ObjectId
+from typing import Optional
+
+router = APIRouter()
+
+@router.get("/")
+async def list_activity(
+    limit: int = Query(50, ge=1, le=200),
+    before: Optional[str] = None,
+    current_user=Depends(get_current_user)
+):
+    """Recent activity, newest first. Pass `next_before` from a page to fetch the next one."""
+    query = {"user_id": current_user["_id"]}
+    if before:
+        if not ObjectId.is_valid(before):
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+        query["_id"] = {"$lt": ObjectId(before)}
+    events = await read_db["activity"].find(query, max_time_ms=settings.mongo_query_timeout_ms).sort("_id", -1).limit(limit).to_list(limit)
+    items = []
+    for event in events:
+        item = to_jsonable(event)
+        item["id"] = item.pop("_id")
+        item.pop("user_id", None)
+        items.append(item)
+    return {
+        "items": items,
+        "next_before": items[-1]["id"] if len(items) == limit else None,
+    }
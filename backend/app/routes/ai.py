@@ -1,11 +1,15 @@
-from fastapi import APIRouter, Depends, HTTPException, Body, status, Request, Response
+from fastapi import APIRouter, Depends, HTTPException, Body, Query, status, Request, Response
+from fastapi.responses import StreamingResponse
 from app.auth import get_current_user
+from app.ai_models import semantic_matcher
 import logging
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, constr
 from typing import List, Dict, Optional, Callable
 from datetime import datetime
+import asyncio
 import json
 import os
+import re
 from pathlib import Path
 from starlette.middleware.base import BaseHTTPMiddleware
 import uuid
@@ -20,31 +24,39 @@ logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
+# Larger or non-JSON request bodies are never buffered for debug logging
+MAX_LOGGED_BODY_BYTES = 10 * 1024
+
 # In-memory storage for chat history
 chat_history = defaultdict(list)
 
+# A word plus its trailing whitespace, so joining the chunks reproduces the answer exactly
+TOKEN_RE = re.compile(r"\S+\s*|\s+")
+
 class RequestLoggingMiddleware(BaseHTTPMiddleware):
     """Middleware for logging request and response details"""
     
+    @staticmethod
+    async def _loggable_body(request: Request):
+        """Small JSON bodies only; uploads and streams are described, never read into memory."""
+        content_type = request.headers.get("content-type", "")
+        length = request.headers.get("content-length")
+        if not content_type.startswith("application/json") or not (length or "").isdigit() or int(length) > MAX_LOGGED_BODY_BYTES:
+            return f"<{content_type or 'no content type'}, {length or 'unknown'} bytes>"
+        body = await request.body()
+        try:
+            return json.loads(body)
+        except ValueError:
+            return body.decode("utf-8", errors="replace")
+    
     async def dispatch(self, request: Request, call_next: Callable) -> Response:
         # Generate unique request ID
         request_id = str(uuid.uuid4())
         
-        # Log request details
-        request_body = None
-        try:
-            request_body = await request.body()
-            if request_body:
-                try:
-                    request_body = json.loads(request_body)
-                except:
-                    request_body = request_body.decode('utf-8')
-        except:
-            pass
-        
         logger.info(f"Request {request_id} - Method: {request.method} - Path: {request.url.path}")
-        logger.debug(f"Request {request_id} - Headers: {dict(request.headers)}")
-        logger.debug(f"Request {request_id} - Body: {request_body}")
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug(f"Request {request_id} - Headers: {dict(request.headers)}")
+            logger.debug(f"Request {request_id} - Body: {await self._loggable_body(request)}")
         
         # Process request
         try:
@@ -200,8 +212,9 @@ class MentorRequest(BaseModel):
         max_length=1000,
         description="The task or question to get advice about"
     )
-    tasks: List[str] = Field(
+    tasks: List[constr(max_length=200)] = Field(
         default_factory=list,
+        max_length=10,
         description="Optional list of current tasks for context"
     )
     priority: Optional[str] = Field(
@@ -354,6 +367,15 @@ def generate_response(request: MentorRequest) -> str:
     
     return base_response
 
+async def resolve_query(request: MentorRequest) -> MentorRequest:
+    """Rewrite paraphrased questions to the closest known question once the embedding model is ready."""
+    if request.text.lower().strip() in SPECIFIC_QA_RESPONSES:
+        return request
+    matched = await semantic_matcher.match(request.text)
+    if matched is None:
+        return request
+    return request.model_copy(update={"text": matched})
+
 def save_chat_message(user_id: str, message: str, response: str, tasks: List[str] = None):
     """Save a chat message to in-memory storage"""
     chat_message = {
@@ -384,7 +406,7 @@ async def get_mentor_advice(
 ):
     """Get advice from the mentor based on the user's query."""
     try:
-        response = generate_response(request)
+        response = generate_response(await resolve_query(request))
         
         # Save the chat message
         user_id = str(current_user.get("_id"))
@@ -405,11 +427,58 @@ async def get_mentor_advice(
             detail="Failed to generate response"
         )
 
+def sse_event(event: str, data: dict) -> str:
+    """Format one Server-Sent Event frame."""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+@router.post("/mentor/stream")
+async def stream_mentor_advice(
+    body: MentorRequest,
+    request: Request,
+    current_user=Depends(get_current_user)
+):
+    """Stream the mentor's answer as Server-Sent Events, one `token` event per word.
+
+    A final `done` event carries the full response. The message is only saved
+    to history once the whole answer was sent; if the client disconnects the
+    stream stops and nothing is stored.
+    """
+    user_id = str(current_user.get("_id"))
+
+    async def events():
+        try:
+            response = generate_response(await resolve_query(body))
+        except Exception as e:
+            logger.error(f"Error generating response: {str(e)}")
+            yield sse_event("error", {"detail": "Failed to generate response"})
+            return
+
+        for token in TOKEN_RE.findall(response):
+            if await request.is_disconnected():
+                logger.info(f"Mentor stream for user {user_id} cancelled by client")
+                return
+            yield sse_event("token", {"text": token})
+            # Give the server a chance to flush this frame before the next one
+            await asyncio.sleep(0)
+
+        save_chat_message(user_id, body.text, response, body.tasks)
+        yield sse_event("done", {"response": response})
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={
+            "Cache-Control": "no-cache",
+            # Stop nginx-style proxies from buffering the stream
+            "X-Accel-Buffering": "no",
+        },
+    )
+
 @router.get("/history")
 async def get_chat_history(
     current_user=Depends(get_current_user),
-    limit: int = 50,
-    skip: int = 0
+    limit: int = Query(50, ge=1, le=200),
+    skip: int = Query(0, ge=0)
 ):
     """Get chat history for the current user"""
     try:
@@ -455,5 +524,7 @@ async def health_check():
     return {
         "status": "healthy",
         "service": "mentor",
-        "timestamp": datetime.utcnow().isoformat()
+        "timestamp": datetime.utcnow().isoformat(),
+        # Rule-based answers work regardless; "ready" adds paraphrase matching
+        "models": {"semantic_matcher": semantic_matcher.health()},
     } 
\ No newline at end of file
@@ -0,0 +1,200 @@
+from fastapi import APIRouter, Depends, HTTPException, Request, status
+from fastapi.responses import StreamingResponse
+from starlette.datastructures import UploadFile as StarletteUploadFile
+from motor.motor_asyncio import AsyncIOMotorGridFSBucket
+from gridfs.errors import NoFile
+from app.auth import get_current_user
+from app.config import settings
+from app.db import db, get_database
+from app.schemas import AttachmentRef
+from app.permissions import require_task_role
+from app.trash import ACTIVE, release_attachments
+from bson import ObjectId
+from typing import List
+import hashlib
+import logging
+import re
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter()
+
+BUCKET_NAME = "attachments"
+# Size of the reads used for hashing, uploading and streaming downloads
+CHUNK_SIZE = 256 * 1024
+RANGE_RE = re.compile(r"^bytes=(\d*)-(\d*)$")
+# Allowance for multipart boundaries and part headers around the file itself
+MULTIPART_OVERHEAD = 64 * 1024
+
+
+def _bucket() -> AsyncIOMotorGridFSBucket:
+    return AsyncIOMotorGridFSBucket(get_database(), bucket_name=BUCKET_NAME, chunk_size_bytes=CHUNK_SIZE)
+
+
+async def _get_task(task_id: str, user, required: str):
+    task = await db["tasks"].find_one(
+        {"_id": ObjectId(task_id), **ACTIVE}, {"attachments": 1, "user_id": 1, "project_id": 1, "assignee_ids": 1}
+    )
+    await require_task_role(user, task, required)
+    return task
+
+
+def _find_ref(task: dict, attachment_id: str) -> dict:
+    for ref in task.get("attachments") or []:
+        if isinstance(ref, dict) and ref.get("id") == attachment_id:
+            return ref
+    raise HTTPException(status_code=404, detail="Attachment not found")
+
+
+async def _hash_upload(file: StarletteUploadFile):
+    """Hash the spooled upload in one pass, enforcing the size limit as we go."""
+    digest = hashlib.sha256()
+    size = 0
+    while chunk := await file.read(CHUNK_SIZE):
+        size += len(chunk)
+        if size > settings.max_attachment_bytes:
+            raise HTTPException(
+                status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                detail=f"Attachment exceeds {settings.max_attachment_bytes} bytes"
+            )
+        digest.update(chunk)
+    await file.seek(0)
+    return digest.hexdigest(), size
+
+
+@router.get("/{task_id}/attachments", response_model=List[AttachmentRef])
+async def list_attachments(task_id: str, current_user=Depends(get_current_user)):
+    task = await _get_task(task_id, current_user, "viewer")
+    return [ref for ref in task.get("attachments") or [] if isinstance(ref, dict)]
+
+
+def _check_upload_length(request: Request):
+    """Refuse an oversized upload from its Content-Length before any of the body is read."""
+    length = request.headers.get("content-length")
+    if length and length.isdigit() and int(length) > settings.max_attachment_bytes + MULTIPART_OVERHEAD:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"Attachment exceeds {settings.max_attachment_bytes} bytes"
+        )
+
+
+async def _read_upload(request: Request):
+    """The multipart form and its `file` part; parsed here rather than with File() so the checks above run first."""
+    form = await request.form()
+    file = form.get("file")
+    if not isinstance(file, StarletteUploadFile):
+        await form.close()
+        raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail="Missing file")
+    return form, file
+
+
+@router.post("/{task_id}/attachments", response_model=AttachmentRef, status_code=status.HTTP_201_CREATED)
+async def upload_attachment(task_id: str, request: Request, current_user=Depends(get_current_user)):
+    """Upload a file (multipart field `file`) to GridFS and attach a small reference to the task.
+
+    Identical content already uploaded by the same user is stored only once.
+    """
+    user_id = current_user["_id"]
+    _check_upload_length(request)
+    task = await _get_task(task_id, current_user, "editor")
+    if len(task.get("attachments") or []) >= settings.max_attachments_per_task:
+        raise HTTPException(status_code=400, detail="Too many attachments on this task")
+
+    form, file = await _read_upload(request)
+    try:
+        ref = await _store_upload(task_id, file, user_id)
+    finally:
+        await form.close()
+    await db["tasks"].update_one({"_id": task["_id"]}, {"$push": {"attachments": ref}})
+    return ref
+
+
+async def _store_upload(task_id: str, file: StarletteUploadFile, user_id) -> dict:
+    sha256, size = await _hash_upload(file)
+    content_type = file.content_type or "application/octet-stream"
+    filename = file.filename or "attachment"
+
+    existing = await db[f"{BUCKET_NAME}.files"].find_one(
+        {"metadata.user_id": user_id, "metadata.sha256": sha256}, {"_id": 1}
+    )
+    if existing:
+        file_id = existing["_id"]
+    else:
+        grid_in = _bucket().open_upload_stream(
+            filename,
+            metadata={"user_id": user_id, "sha256": sha256, "content_type": content_type},
+        )
+        try:
+            while chunk := await file.read(CHUNK_SIZE):
+                await grid_in.write(chunk)
+            await grid_in.close()
+        except Exception as e:
+            await grid_in.abort()
+            logger.error(f"Attachment upload failed for task {task_id}: {e}")
+            raise HTTPException(status_code=500, detail="Error storing attachment")
+        file_id = grid_in._id
+
+    return {"id": str(file_id), "filename": filename, "content_type": content_type, "size": size, "sha256": sha256}
+
+
+@router.get("/{task_id}/attachments/{attachment_id}")
+async def download_attachment(task_id: str, attachment_id: str, request: Request, current_user=Depends(get_current_user)):
+    """Stream an attachment, honouring a single `Range: bytes=start-end` header."""
+    task = await _get_task(task_id, current_user, "viewer")
+    ref = _find_ref(task, attachment_id)
+    try:
+        grid_out = await _bucket().open_download_stream(ObjectId(attachment_id))
+    except NoFile:
+        raise HTTPException(status_code=404, detail="Attachment not found")
+
+    length = grid_out.length
+    start, end = 0, length - 1
+    status_code = status.HTTP_200_OK
+    range_header = request.headers.get("range")
+    if range_header and length:
+        match = RANGE_RE.match(range_header.strip())
+        if not match or match.groups() == ("", ""):
+            raise HTTPException(status_code=status.HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE, detail="Invalid range")
+        first, last = match.groups()
+        if first:
+            start = int(first)
+            end = min(int(last), length - 1) if last else length - 1
+        else:
+            # Suffix range: the last N bytes
+            start = max(0, length - int(last))
+        if start > end or start >= length:
+            raise HTTPException(
+                status_code=status.HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE,
+                detail="Range not satisfiable",
+                headers={"Content-Range": f"bytes */{length}"},
+            )
+        status_code = status.HTTP_206_PARTIAL_CONTENT
+
+    async def body():
+        grid_out.seek(start)
+        remaining = end - start + 1
+        while remaining > 0:
+            chunk = await grid_out.read(min(CHUNK_SIZE, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
+
+    headers = {
+        "Accept-Ranges": "bytes",
+        "Content-Length": str(max(0, end - start + 1)),
+        "ETag": f'"{ref["sha256"]}"',
+        "Content-Disposition": 'attachment; filename="{}"'.format(ref["filename"].replace('"', "")),
+    }
+    if status_code == status.HTTP_206_PARTIAL_CONTENT:
+        headers["Content-Range"] = f"bytes {start}-{end}/{length}"
+    return StreamingResponse(body(), status_code=status_code, media_type=ref["content_type"], headers=headers)
+
+
+@router.delete("/{task_id}/attachments/{attachment_id}")
+async def delete_attachment(task_id: str, attachment_id: str, current_user=Depends(get_current_user)):
+    task = await _get_task(task_id, current_user, "editor")
+    _find_ref(task, attachment_id)
+    await db["tasks"].update_one({"_id": task["_id"]}, {"$pull": {"attachments": {"id": attachment_id}}})
+    await release_attachments([attachment_id])
+    return {"ok": True}
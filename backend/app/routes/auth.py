@@ -1,7 +1,8 @@
 from fastapi import APIRouter, Depends, HTTPException, status, Response, Request
 from app.schemas import UserCreate, UserLogin, UserOut, Token
-from app.auth import get_password_hash, verify_password, create_access_token, get_current_user
+from app.auth import get_password_hash, verify_password, create_access_token, get_current_user, revoke_user_tokens
 from app.db import db
+from app.account_deletion import create_deletion_job, start_deletion_job, get_deletion_job
 from bson import ObjectId
 import os
 from dotenv import load_dotenv
@@ -44,7 +45,7 @@ async def register(user: UserCreate, response: Response):
             )
 
         # Create access token
-        access_token = create_access_token(data={"sub": str(result.inserted_id)})
+        access_token = create_access_token(data={"sub": str(result.inserted_id), "ver": 0})
         
         return {"access_token": access_token, "token_type": "bearer"}
     except HTTPException as he:
@@ -60,7 +61,7 @@ async def login(user: UserLogin, response: Response):
     try:
         # Find user
         db_user = await db["users"].find_one({"email": user.email})
-        if not db_user:
+        if not db_user or db_user.get("deleting"):
             raise HTTPException(
                 status_code=status.HTTP_401_UNAUTHORIZED,
                 detail="Incorrect email or password"
@@ -74,9 +75,9 @@ async def login(user: UserLogin, response: Response):
             )
 
         # Create access token
-        access_token = create_access_token(data={"sub": str(db_user["_id"])})
-        logging.info(f"Created access token: {access_token}")
-        logging.info(f"Token segments: {access_token.split('.')}")
+        access_token = create_access_token(
+            data={"sub": str(db_user["_id"]), "ver": db_user.get("token_version", 0)}
+        )
         
         return {"access_token": access_token, "token_type": "bearer"}
     except HTTPException as he:
@@ -88,6 +89,19 @@ async def login(user: UserLogin, response: Response):
             detail="Error during login"
         )
 
+@router.post("/logout")
+async def logout(current_user=Depends(get_current_user)):
+    """Revoke all of the user's tokens (logs out every session)."""
+    try:
+        await revoke_user_tokens(current_user["_id"])
+        return {"message": "Logged out successfully"}
+    except Exception as e:
+        logging.error(f"Logout error: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Error during logout"
+        )
+
 @router.post("/forgot-password")
 async def forgot_password(request: Request):
     try:
@@ -175,33 +189,44 @@ async def me(current_user=Depends(get_current_user)):
             detail="Error fetching user data"
         )
 
-@router.delete("/me", status_code=status.HTTP_204_NO_CONTENT)
+@router.delete("/me", status_code=status.HTTP_202_ACCEPTED)
 async def delete_account(current_user=Depends(get_current_user)):
+    """Start purging the account in the background and return the job to poll."""
     try:
-        # Delete user's tasks
-        await db["tasks"].delete_many({"user_id": current_user["_id"]})
-        
-        # Delete user's projects
-        await db["projects"].delete_many({"user_id": current_user["_id"]})
-        
-        # Delete user's notifications
-        await db["notifications"].delete_many({"user_id": current_user["_id"]})
-        
-        # Delete user's chat history
-        await db["chat_history"].delete_many({"user_id": current_user["_id"]})
-        
-        # Finally, delete the user
-        result = await db["users"].delete_one({"_id": current_user["_id"]})
-        
-        if result.deleted_count == 0:
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND,
-                detail="User not found"
-            )
-            
-        return Response(status_code=status.HTTP_204_NO_CONTENT)
+        job = await create_deletion_job(current_user["_id"])
+        start_deletion_job(job["_id"])
+        return {
+            "job_id": job["_id"],
+            "status": job["status"],
+            "status_url": f"/api/auth/deletion-jobs/{job['_id']}",
+        }
+    except HTTPException as he:
+        raise he
     except Exception as e:
+        logging.error(f"Error scheduling account deletion: {e}")
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="Error deleting account"
-        ) 
\ No newline at end of file
+        )
+
+@router.get("/deletion-jobs/{job_id}")
+async def deletion_job_status(job_id: str):
+    """Report progress of an account deletion job.
+
+    Unauthenticated on purpose: the account's token stops working as soon as
+    deletion starts, so the unguessable job id acts as the credential.
+    """
+    job = await get_deletion_job(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Deletion job not found")
+    return {
+        "job_id": job["_id"],
+        "status": job["status"],
+        "progress": job.get("progress", {}),
+        "error": job.get("error"),
+        "attempts": job.get("attempts", 0),
+        # None once a failed job has used up its attempts
+        "next_attempt_at": job["next_attempt_at"].isoformat() if job.get("next_attempt_at") else None,
+        "created_at": job["created_at"].isoformat(),
+        "updated_at": job["updated_at"].isoformat(),
+    }
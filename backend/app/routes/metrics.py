@@ -0,0 +1,10 @@
+from fastapi import APIRouter, Response
+from prometheus_client import CONTENT_TYPE_LATEST
+from app.metrics import render_metrics
+
+router = APIRouter()
+
+@router.get("/metrics", include_in_schema=False)
+async def metrics():
+    """Expose Prometheus metrics (aggregated across workers in multiprocess mode)."""
+    return Response(content=render_metrics(), media_type=CONTENT_TYPE_LATEST)
@@ -1,43 +1,130 @@
 from fastapi import APIRouter, Depends, HTTPException
-from app.schemas import ProjectCreate, ProjectOut
+from app.schemas import ProjectCreate, ProjectOut, ProjectMemberCreate, ProjectMemberOut
 from app.auth import get_current_user
+from app.config import settings
 from app.db import db
+from app.cache import project_list_cache
+from app.activity import record_activity, diff_fields
+from app.permissions import accessible_projects, require_project_role, invalidate_access
+from app.trash import ACTIVE, trash_project
+from pymongo import ReturnDocument
 from bson import ObjectId
+from datetime import datetime
 
 router = APIRouter()
 
+async def project_audience(project_id) -> list:
+    """Owner and member ids of a project, whose cached views must be refreshed on change."""
+    project = await db["projects"].find_one({"_id": project_id}, {"user_id": 1})
+    members = await db["project_members"].distinct("user_id", {"project_id": project_id})
+    return ([project["user_id"]] if project else []) + members
+
 @router.get("/", response_model=list[ProjectOut])
 async def list_projects(current_user=Depends(get_current_user)):
-    projects = await db["projects"].find({"user_id": current_user["_id"]}).to_list(100)
-    return [{**project, "id": str(project["_id"])} for project in projects]
+    """Projects the user owns or is a member of."""
+    roles = await accessible_projects(current_user)
+    projects = await project_list_cache.get_or_load(
+        str(current_user["_id"]),
+        # Cached for everyone until invalidated, so load from the primary rather than a lagging secondary
+        lambda: db["projects"].find(
+            {"_id": {"$in": [ObjectId(project_id) for project_id in roles]}}, max_time_ms=settings.mongo_query_timeout_ms
+        ).to_list(settings.max_page_size)
+    )
+    return [{**project, "id": str(project["_id"]), "role": roles.get(str(project["_id"]))} for project in projects]
 
 @router.post("/", response_model=ProjectOut)
 async def create_project(project: ProjectCreate, current_user=Depends(get_current_user)):
     project_doc = project.dict()
     project_doc["user_id"] = current_user["_id"]
+    project_doc["deleted_at"] = None
     result = await db["projects"].insert_one(project_doc)
     project_doc["_id"] = result.inserted_id
-    return {**project_doc, "id": str(result.inserted_id)}
+    await invalidate_access([current_user["_id"]])
+    record_activity(current_user["_id"], "created", "project", result.inserted_id, {"name": {"from": None, "to": project_doc["name"]}})
+    return {**project_doc, "id": str(result.inserted_id), "role": "owner"}
 
 @router.get("/{project_id}", response_model=ProjectOut)
 async def get_project(project_id: str, current_user=Depends(get_current_user)):
-    project = await db["projects"].find_one({"_id": ObjectId(project_id), "user_id": current_user["_id"]})
+    role = await require_project_role(current_user, project_id, "viewer")
+    project = await db["projects"].find_one({"_id": ObjectId(project_id), **ACTIVE})
     if not project:
         raise HTTPException(status_code=404, detail="Project not found")
-    return {**project, "id": str(project["_id"])}
+    return {**project, "id": str(project["_id"]), "role": role}
 
 @router.put("/{project_id}", response_model=ProjectOut)
 async def update_project(project_id: str, project: ProjectCreate, current_user=Depends(get_current_user)):
+    role = await require_project_role(current_user, project_id, "editor")
     update_doc = project.dict()
-    result = await db["projects"].update_one({"_id": ObjectId(project_id), "user_id": current_user["_id"]}, {"$set": update_doc})
-    if result.modified_count == 0:
+    before = await db["projects"].find_one_and_update(
+        {"_id": ObjectId(project_id), **ACTIVE},
+        {"$set": update_doc},
+        return_document=ReturnDocument.BEFORE
+    )
+    changes = diff_fields(before, update_doc) if before else {}
+    if not changes:
         raise HTTPException(status_code=404, detail="Project not found or not updated")
-    updated = await db["projects"].find_one({"_id": ObjectId(project_id)})
-    return {**updated, "id": str(updated["_id"])}
+    for user_id in await project_audience(before["_id"]):
+        await project_list_cache.invalidate(str(user_id))
+    record_activity(current_user["_id"], "updated", "project", before["_id"], changes)
+    updated = {**before, **update_doc}
+    return {**updated, "id": str(updated["_id"]), "role": role}
 
 @router.delete("/{project_id}")
 async def delete_project(project_id: str, current_user=Depends(get_current_user)):
-    result = await db["projects"].delete_one({"_id": ObjectId(project_id), "user_id": current_user["_id"]})
+    """Move a project to the trash; members lose access until it is restored."""
+    await require_project_role(current_user, project_id, "owner")
+    audience = await project_audience(ObjectId(project_id))
+    deleted_at = await trash_project(ObjectId(project_id), current_user["_id"])
+    await invalidate_access(audience)
+    record_activity(current_user["_id"], "trashed", "project", ObjectId(project_id))
+    return {"ok": True, "deleted_at": deleted_at}
+
+@router.get("/{project_id}/members", response_model=list[ProjectMemberOut])
+async def list_members(project_id: str, current_user=Depends(get_current_user)):
+    await require_project_role(current_user, project_id, "viewer")
+    project = await db["projects"].find_one({"_id": ObjectId(project_id)}, {"user_id": 1})
+    members = await db["project_members"].find(
+        {"project_id": ObjectId(project_id), **ACTIVE}, max_time_ms=settings.mongo_query_timeout_ms
+    ).to_list(1000)
+    roles = {member["user_id"]: member["role"] for member in members}
+    if project:
+        roles[project["user_id"]] = "owner"
+    users = await db["users"].find({"_id": {"$in": list(roles)}}, {"name": 1, "email": 1}).to_list(len(roles))
+    return [
+        {"user_id": str(user["_id"]), "name": user["name"], "email": user["email"], "role": roles[user["_id"]]}
+        for user in users
+    ]
+
+@router.post("/{project_id}/members", response_model=ProjectMemberOut)
+async def add_member(project_id: str, member: ProjectMemberCreate, current_user=Depends(get_current_user)):
+    """Share a project with another user, or change their role."""
+    await require_project_role(current_user, project_id, "owner")
+    user = await db["users"].find_one({"email": member.email}, {"name": 1, "email": 1})
+    if not user:
+        raise HTTPException(status_code=404, detail="User not found")
+    if user["_id"] == current_user["_id"]:
+        raise HTTPException(status_code=400, detail="The owner is already a member")
+    await db["project_members"].update_one(
+        {"project_id": ObjectId(project_id), "user_id": user["_id"]},
+        {"$set": {"role": member.role}, "$setOnInsert": {"added_at": datetime.utcnow(), "deleted_at": None}},
+        upsert=True
+    )
+    await invalidate_access([user["_id"]])
+    record_activity(current_user["_id"], "shared", "project", ObjectId(project_id), {
+        "member": {"from": None, "to": {"user_id": user["_id"], "role": member.role}}
+    })
+    return {"user_id": str(user["_id"]), "name": user["name"], "email": user["email"], "role": member.role}
+
+@router.delete("/{project_id}/members/{user_id}")
+async def remove_member(project_id: str, user_id: str, current_user=Depends(get_current_user)):
+    # Owners can remove anyone; members can remove themselves (leave the project)
+    if user_id != str(current_user["_id"]):
+        await require_project_role(current_user, project_id, "owner")
+    result = await db["project_members"].delete_one({"project_id": ObjectId(project_id), "user_id": ObjectId(user_id)})
     if result.deleted_count == 0:
-        raise HTTPException(status_code=404, detail="Project not found")
-    return {"ok": True} 
\ No newline at end of file
+        raise HTTPException(status_code=404, detail="Member not found")
+    await invalidate_access([ObjectId(user_id)])
+    record_activity(current_user["_id"], "unshared", "project", ObjectId(project_id), {
+        "member": {"from": {"user_id": ObjectId(user_id)}, "to": None}
+    })
+    return {"ok": True}
@@ -0,0 +1,14 @@
+from fastapi import APIRouter, Depends, Query
+from app.auth import get_current_user
+from app.tags import search_tags
+
+router = APIRouter()
+
+@router.get("/")
+async def list_tags(
+    prefix: str = Query("", max_length=50),
+    limit: int = Query(20, ge=1, le=100),
+    current_user=Depends(get_current_user)
+):
+    """Autocomplete the user's tags by prefix, or list the most used ones. Each item has `name` and `count`."""
+    return await search_tags(current_user["_id"], prefix, limit)
@@ -1,22 +1,128 @@
-from fastapi import APIRouter, Depends, HTTPException, Request
-from app.schemas import TaskCreate, TaskOut
+from fastapi import APIRouter, Depends, HTTPException, Request, Response, Query
+from app.schemas import TaskCreate, TaskOut, NextTasksOut
 from app.auth import get_current_user
-from app.db import db
+from app.config import settings
+from app.db import db, read_db
+from app.activity import record_activity, diff_fields
+from app.permissions import require_project_role, require_task_role, task_access_filter
+from app.task_graph import (
+    DONE_STATUSES, is_done, adjust_rollup, subtree_weight, ensure_valid_parent,
+    ensure_no_dependency_cycle, load_tree, next_actions, to_object_ids,
+)
+from app.trash import ACTIVE, trash_task
+from app.quotas import reserve_tasks, release_tasks, ensure_document_size
+from app.tags import adjust_tags, tag_changes
+from pymongo.errors import ExecutionTimeout
+from app.utils import to_jsonable
+from pymongo import ReturnDocument
 from bson import ObjectId
+from typing import Optional
 
 router = APIRouter()
 
+RELATION_FIELDS = ("assignee_ids", "parent_id", "blocked_by")
+
+def serialize_task(task: dict) -> dict:
+    return {
+        **task,
+        "id": str(task["_id"]),
+        "project_id": str(task["project_id"]) if task.get("project_id") else None,
+        "assignee_ids": [str(user_id) for user_id in task.get("assignee_ids") or []],
+        "parent_id": str(task["parent_id"]) if task.get("parent_id") else None,
+        "blocked_by": [str(task_id) for task_id in task.get("blocked_by") or []],
+    }
+
+def serialize_tree(node: dict) -> dict:
+    task = to_jsonable({key: value for key, value in node.items() if key != "subtasks"})
+    task["id"] = task.pop("_id")
+    task.pop("user_id", None)
+    task["subtasks"] = [serialize_tree(child) for child in node["subtasks"]]
+    return task
+
+async def prepare_task_doc(task: TaskCreate, current_user, existing: dict = None) -> dict:
+    """Validate project access, assignees, parent and dependencies, converting ids to ObjectIds."""
+    task_doc = task.dict()
+    if existing:
+        # Relationship fields left out of an update keep their current values
+        for field in RELATION_FIELDS:
+            if field not in task.model_fields_set:
+                task_doc[field] = existing.get(field)
+    if task_doc.get("project_id"):
+        task_doc["project_id"] = ObjectId(task_doc["project_id"])
+        # Moving a task into a project requires edit rights there
+        if not existing or existing.get("project_id") != task_doc["project_id"]:
+            await require_project_role(current_user, task_doc["project_id"], "editor")
+    assignee_ids = [ObjectId(user_id) for user_id in dict.fromkeys(task_doc.get("assignee_ids") or [])]
+    for user_id in assignee_ids:
+        if user_id == current_user["_id"]:
+            continue
+        if not task_doc.get("project_id"):
+            raise HTTPException(status_code=400, detail="Tasks outside a project can only be assigned to yourself")
+        # The assignee must be the owner or a member of the task's project; read from the
+        # primary so a member who was just added is not rejected while a secondary lags
+        is_member = await db["project_members"].count_documents(
+            {"project_id": task_doc["project_id"], "user_id": user_id, **ACTIVE}, limit=1, maxTimeMS=settings.mongo_query_timeout_ms
+        ) or await db["projects"].count_documents(
+            {"_id": task_doc["project_id"], "user_id": user_id, **ACTIVE}, limit=1, maxTimeMS=settings.mongo_query_timeout_ms
+        )
+        if not is_member:
+            raise HTTPException(status_code=400, detail="Assignees must be members of the task's project")
+    task_doc["assignee_ids"] = assignee_ids
+
+    task_id = existing["_id"] if existing else None
+    task_doc["parent_id"] = ObjectId(task_doc["parent_id"]) if task_doc.get("parent_id") else None
+    if task_doc["parent_id"] and (not existing or existing.get("parent_id") != task_doc["parent_id"]):
+        parent = await db["tasks"].find_one(
+            {"_id": task_doc["parent_id"], **ACTIVE}, {"user_id": 1, "project_id": 1, "assignee_ids": 1}
+        )
+        await require_task_role(current_user, parent, "editor")
+        await ensure_valid_parent(task_id, task_doc["parent_id"])
+    task_doc["blocked_by"] = to_object_ids(task_doc.get("blocked_by"))
+    new_blockers = set(task_doc["blocked_by"]) - set((existing or {}).get("blocked_by") or [])
+    if new_blockers:
+        # On the primary, so a task created just before is found even while a secondary lags
+        visible = await db["tasks"].count_documents(
+            {"$and": [{"_id": {"$in": list(new_blockers)}}, await task_access_filter(current_user)]},
+            maxTimeMS=settings.mongo_query_timeout_ms
+        )
+        if visible != len(new_blockers):
+            raise HTTPException(status_code=400, detail="Blocking tasks not found")
+        await ensure_no_dependency_cycle(task_id, task_doc["blocked_by"])
+    ensure_document_size(task_doc)
+    return task_doc
+
 @router.get("/", response_model=list[TaskOut])
-async def list_tasks(request: Request, current_user=Depends(get_current_user)):
+async def list_tasks(
+    request: Request,
+    response: Response,
+    limit: int = Query(100, ge=1, le=settings.max_page_size),
+    before: Optional[str] = None,
+    tag: Optional[str] = Query(None, max_length=50),
+    current_user=Depends(get_current_user)
+):
+    """The user's own tasks, tasks assigned to them and tasks in projects shared with them, newest first.
+
+    When more tasks follow, the `X-Next-Before` header holds the cursor to pass as `before`.
+    """
+    if before and not ObjectId.is_valid(before):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
     try:
-        print("Attempting to fetch tasks for user:", current_user["_id"])
-        tasks = await db["tasks"].find({"user_id": current_user["_id"]}).to_list(100)
-        print("Successfully fetched tasks:", tasks)
-        return [{
-            **task,
-            "id": str(task["_id"]),
-            "project_id": str(task["project_id"]) if task.get("project_id") else None
-        } for task in tasks]
+        query = await task_access_filter(current_user)
+        # Inside each branch so every branch keeps using its own (field, _id) index
+        extra = {}
+        if tag:
+            extra["tags"] = tag
+        if before:
+            extra["_id"] = {"$lt": ObjectId(before)}
+        if extra:
+            query = {"$or": [{**clause, **extra} for clause in query["$or"]]}
+        cursor = read_db["tasks"].find(query, max_time_ms=settings.mongo_query_timeout_ms).sort("_id", -1).limit(limit)
+        tasks = await cursor.to_list(limit)
+        if len(tasks) == limit:
+            response.headers["X-Next-Before"] = str(tasks[-1]["_id"])
+        return [serialize_task(task) for task in tasks]
+    except ExecutionTimeout:
+        raise
     except Exception as e:
         print("Error fetching tasks:", e)
         import traceback
@@ -25,35 +131,88 @@ async def list_tasks(request: Request, current_user=Depends(get_current_user)):
 
 @router.post("/", response_model=TaskOut)
 async def create_task(request: Request, task: TaskCreate, current_user=Depends(get_current_user)):
-    task_doc = task.dict()
+    task_doc = await prepare_task_doc(task, current_user)
     task_doc["user_id"] = current_user["_id"]
-    if task_doc.get("project_id"):
-        task_doc["project_id"] = ObjectId(task_doc["project_id"])
-    result = await db["tasks"].insert_one(task_doc)
+    task_doc["attachments"] = []
+    task_doc["subtask_count"] = 0
+    task_doc["completed_subtask_count"] = 0
+    task_doc["deleted_at"] = None
+    await reserve_tasks(current_user["_id"])
+    try:
+        result = await db["tasks"].insert_one(task_doc)
+    except Exception:
+        await release_tasks(current_user["_id"])
+        raise
     task_doc["_id"] = result.inserted_id
-    return {**task_doc, "id": str(result.inserted_id)}
+    await adjust_tags(current_user["_id"], tag_changes([], task_doc.get("tags")))
+    await adjust_rollup(task_doc["parent_id"], 1, int(is_done(task_doc)))
+    record_activity(current_user["_id"], "created", "task", result.inserted_id, {"title": {"from": None, "to": task_doc["title"]}})
+    return serialize_task(task_doc)
+
+@router.get("/next", response_model=NextTasksOut)
+async def next_tasks(
+    request: Request,
+    limit: int = Query(1000, ge=1, le=1000),
+    current_user=Depends(get_current_user)
+):
+    """Open tasks in dependency order: `ready` can be started now, `order` is a full topological order."""
+    query = {"$and": [await task_access_filter(current_user), {"status": {"$nin": list(DONE_STATUSES)}}]}
+    open_tasks = await read_db["tasks"].find(query, max_time_ms=settings.mongo_query_timeout_ms).to_list(limit)
+    plan = await next_actions(open_tasks)
+    return {key: [serialize_task(task) for task in tasks] for key, tasks in plan.items()}
+
+@router.get("/{task_id}/tree")
+async def get_task_tree(request: Request, task_id: str, current_user=Depends(get_current_user)):
+    """A task with all nested subtasks, fetched in a single $graphLookup."""
+    task = await db["tasks"].find_one({"_id": ObjectId(task_id), **ACTIVE}, {"user_id": 1, "project_id": 1, "assignee_ids": 1})
+    await require_task_role(current_user, task, "viewer")
+    tree = await load_tree(task["_id"])
+    if tree is None:
+        raise HTTPException(status_code=404, detail="Task not found")
+    return serialize_tree(tree)
 
 @router.get("/{task_id}", response_model=TaskOut)
 async def get_task(request: Request, task_id: str, current_user=Depends(get_current_user)):
-    task = await db["tasks"].find_one({"_id": ObjectId(task_id), "user_id": current_user["_id"]})
-    if not task:
-        raise HTTPException(status_code=404, detail="Task not found")
-    return {**task, "id": str(task["_id"])}
+    task = await db["tasks"].find_one({"_id": ObjectId(task_id), **ACTIVE})
+    await require_task_role(current_user, task, "viewer")
+    return serialize_task(task)
 
 @router.put("/{task_id}", response_model=TaskOut)
 async def update_task(request: Request, task_id: str, task: TaskCreate, current_user=Depends(get_current_user)):
-    update_doc = task.dict()
-    if update_doc.get("project_id"):
-        update_doc["project_id"] = ObjectId(update_doc["project_id"])
-    result = await db["tasks"].update_one({"_id": ObjectId(task_id), "user_id": current_user["_id"]}, {"$set": update_doc})
-    if result.modified_count == 0:
+    existing = await db["tasks"].find_one({"_id": ObjectId(task_id), **ACTIVE}, {"attachments": 0, "description": 0})
+    await require_task_role(current_user, existing, "editor")
+    update_doc = await prepare_task_doc(task, current_user, existing)
+    # Returning the previous version lets us record what changed without an extra read
+    before = await db["tasks"].find_one_and_update(
+        {"_id": ObjectId(task_id), **ACTIVE},
+        {"$set": update_doc},
+        return_document=ReturnDocument.BEFORE
+    )
+    changes = diff_fields(before, update_doc) if before else {}
+    if not changes:
         raise HTTPException(status_code=404, detail="Task not found or not updated")
-    updated = await db["tasks"].find_one({"_id": ObjectId(task_id)})
-    return {**updated, "id": str(updated["_id"])}
+    record_activity(current_user["_id"], "updated", "task", before["_id"], changes)
+    after = {**before, **update_doc}
+    await adjust_tags(before["user_id"], tag_changes(before.get("tags"), after.get("tags")))
+    if before.get("parent_id") != after.get("parent_id"):
+        # Move the whole subtree's contribution from the old ancestors to the new ones
+        old_total, old_done = subtree_weight(before)
+        new_total, new_done = subtree_weight(after)
+        await adjust_rollup(before.get("parent_id"), -old_total, -old_done)
+        await adjust_rollup(after.get("parent_id"), new_total, new_done)
+    elif is_done(before) != is_done(after):
+        await adjust_rollup(after.get("parent_id"), 0, 1 if is_done(after) else -1)
+    return serialize_task(after)
 
 @router.delete("/{task_id}")
 async def delete_task(request: Request, task_id: str, current_user=Depends(get_current_user)):
-    result = await db["tasks"].delete_one({"_id": ObjectId(task_id), "user_id": current_user["_id"]})
-    if result.deleted_count == 0:
-        raise HTTPException(status_code=404, detail="Task not found")
-    return {"ok": True} 
\ No newline at end of file
+    """Move a task and its subtasks to the trash; see `/api/trash` to restore them."""
+    existing = await db["tasks"].find_one(
+        {"_id": ObjectId(task_id), **ACTIVE},
+        {"user_id": 1, "project_id": 1, "assignee_ids": 1, "parent_id": 1, "status": 1,
+         "subtask_count": 1, "completed_subtask_count": 1}
+    )
+    await require_task_role(current_user, existing, "editor")
+    deleted_at = await trash_task(existing, current_user["_id"])
+    record_activity(current_user["_id"], "trashed", "task", existing["_id"])
+    return {"ok": True, "deleted_at": deleted_at}
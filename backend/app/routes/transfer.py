@@ -0,0 +1,317 @@
+from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Query, status
+from fastapi.responses import StreamingResponse
+from app.schemas import TaskCreate, ProjectCreate
+from app.auth import get_current_user
+from app.db import db, read_db
+from app.routes.ai import chat_history
+from app.utils import to_jsonable
+from app.trash import ACTIVE
+from app.permissions import invalidate_access
+from app.quotas import try_reserve_tasks, ensure_document_size
+from app.tags import adjust_tags
+from app.task_graph import is_done
+from pymongo import UpdateOne
+from collections import Counter
+from bson import ObjectId
+from pydantic import ValidationError
+from datetime import datetime
+import csv
+import io
+import json
+import logging
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter()
+
+# Number of documents fetched per cursor round trip and inserted per insert_many call
+EXPORT_BATCH_SIZE = 1000
+IMPORT_BATCH_SIZE = 1000
+# Cap on the number of per-line errors echoed back in the import report
+MAX_REPORTED_ERRORS = 20
+
+TASK_CSV_FIELDS = ["id", "title", "description", "status", "priority", "due_date", "project_id", "tags", "attachments"]
+PROJECT_CSV_FIELDS = ["id", "name", "description", "color", "icon"]
+CSV_FIELDS = {"tasks": TASK_CSV_FIELDS, "projects": PROJECT_CSV_FIELDS}
+
+
+def _export_doc(doc: dict) -> dict:
+    """Strip owner fields and expose the document id as a plain `id`."""
+    doc = to_jsonable(doc)
+    doc["id"] = doc.pop("_id")
+    doc.pop("user_id", None)
+    return doc
+
+
+async def _iter_collection(name: str, user_id):
+    # Trashed documents are not exported
+    cursor = read_db[name].find({"user_id": user_id, **ACTIVE}).batch_size(EXPORT_BATCH_SIZE)
+    async for doc in cursor:
+        yield _export_doc(doc)
+
+
+async def _ndjson_stream(user_id):
+    # Projects are written before tasks so an import can remap project_id in a single pass
+    for kind, name in (("project", "projects"), ("task", "tasks")):
+        async for doc in _iter_collection(name, user_id):
+            yield json.dumps({"type": kind, "data": doc}) + "\n"
+    for message in list(chat_history.get(str(user_id), [])):
+        yield json.dumps({"type": "chat", "data": to_jsonable(message)}) + "\n"
+
+
+async def _csv_stream(user_id, collection: str):
+    fields = CSV_FIELDS[collection]
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=fields, extrasaction="ignore")
+    writer.writeheader()
+    async for doc in _iter_collection(collection, user_id):
+        for key in ("tags", "attachments"):
+            if key in fields:
+                doc[key] = json.dumps(doc.get(key) or [])
+        writer.writerow(doc)
+        if buffer.tell() >= 64 * 1024:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+
+@router.get("/export")
+async def export_workspace(
+    format: str = Query("ndjson", pattern="^(ndjson|csv)$"),
+    collection: str = Query("tasks", pattern="^(tasks|projects)$"),
+    current_user=Depends(get_current_user)
+):
+    """Stream the user's workspace as NDJSON (everything) or CSV (one collection)."""
+    stamp = datetime.utcnow().strftime("%Y%m%d%H%M%S")
+    if format == "csv":
+        return StreamingResponse(
+            _csv_stream(current_user["_id"], collection),
+            media_type="text/csv",
+            headers={"Content-Disposition": f'attachment; filename="{collection}-{stamp}.csv"'},
+        )
+    return StreamingResponse(
+        _ndjson_stream(current_user["_id"]),
+        media_type="application/x-ndjson",
+        headers={"Content-Disposition": f'attachment; filename="workspace-{stamp}.ndjson"'},
+    )
+
+
+class _ImportState:
+    """Bookkeeping for a single import: pending batches, id remapping and the report."""
+
+    def __init__(self, user_id, known_project_ids):
+        self.user_id = user_id
+        self.user_key = str(user_id)
+        # Old (exported) project id -> newly inserted ObjectId
+        self.project_map = {}
+        self.known_project_ids = known_project_ids
+        # Old task id -> new ObjectId, and (new id, old parent, old blockers, done) for tasks with links.
+        # Links are resolved after all tasks are inserted, since they may point forward in the file.
+        self.task_map = {}
+        self.task_links = []
+        # New ids of tasks that were not inserted (over quota)
+        self.dropped_task_ids = set()
+        self.pending = {"projects": [], "tasks": []}
+        self.report = {
+            "projects": 0, "tasks": 0, "chat_messages": 0, "skipped": 0, "unresolved_projects": 0,
+            "unresolved_task_links": 0, "dropped_assignees": 0, "over_quota": 0, "errors": [],
+        }
+
+    def error(self, line_no: int, message: str):
+        self.report["skipped"] += 1
+        if len(self.report["errors"]) < MAX_REPORTED_ERRORS:
+            self.report["errors"].append({"line": line_no, "error": message})
+
+    def resolve_project(self, project_id):
+        if not project_id:
+            return None
+        if project_id in self.project_map:
+            return self.project_map[project_id]
+        # Allow references to projects that already exist in the target account
+        if project_id in self.known_project_ids:
+            return ObjectId(project_id)
+        self.report["unresolved_projects"] += 1
+        return None
+
+    def add_project(self, data: dict):
+        old_id = data.get("id")
+        doc = ProjectCreate(**data).dict()
+        doc["_id"] = ObjectId()
+        doc["user_id"] = self.user_id
+        doc["deleted_at"] = None
+        if old_id:
+            self.project_map[str(old_id)] = doc["_id"]
+        self.pending["projects"].append(doc)
+
+    def add_task(self, data: dict):
+        old_id = data.get("id")
+        doc = TaskCreate(**data).dict()
+        doc["_id"] = ObjectId()
+        doc["project_id"] = self.resolve_project(doc.get("project_id"))
+        doc["user_id"] = self.user_id
+        doc["deleted_at"] = None
+        # Attachment files are not part of the export, so their references cannot be restored
+        doc["attachments"] = []
+        # Assignees are user ids of the exporting deployment and membership cannot be checked here
+        if doc.get("assignee_ids"):
+            self.report["dropped_assignees"] += 1
+        doc["assignee_ids"] = []
+        parent_id, blocked_by = doc.get("parent_id"), doc.get("blocked_by") or []
+        doc["parent_id"] = None
+        doc["blocked_by"] = []
+        doc["subtask_count"] = 0
+        doc["completed_subtask_count"] = 0
+        ensure_document_size(doc)
+        if old_id:
+            self.task_map[str(old_id)] = doc["_id"]
+        if parent_id or blocked_by:
+            self.task_links.append((doc["_id"], parent_id, blocked_by, is_done(doc)))
+        self.pending["tasks"].append(doc)
+
+    def resolve_task(self, task_id):
+        new_id = self.task_map.get(str(task_id)) if task_id else None
+        if new_id is None or new_id in self.dropped_task_ids:
+            return None
+        return new_id
+
+    async def link_tasks(self):
+        """Second pass: point parent_id/blocked_by at the new task ids and compute the roll-ups."""
+        updates, parents = [], {}
+        for task_id, old_parent, old_blockers, done in self.task_links:
+            if task_id in self.dropped_task_ids:
+                continue
+            parent_id = self.resolve_task(old_parent)
+            blocked_by = [blocker for blocker in dict.fromkeys(map(self.resolve_task, old_blockers)) if blocker]
+            self.report["unresolved_task_links"] += (bool(old_parent) and parent_id is None) + len(old_blockers) - len(blocked_by)
+            if parent_id:
+                parents[task_id] = (parent_id, done)
+            if parent_id or blocked_by:
+                updates.append(UpdateOne({"_id": task_id}, {"$set": {"parent_id": parent_id, "blocked_by": blocked_by}}))
+        # The exported tasks had no cycles, and remapping ids keeps the structure, so none are introduced
+        totals, completed = Counter(), Counter()
+        for task_id, (parent_id, done) in parents.items():
+            node, seen = parent_id, set()
+            while node is not None and node not in seen:
+                seen.add(node)
+                totals[node] += 1
+                completed[node] += int(done)
+                node = parents.get(node, (None, False))[0]
+        updates.extend(
+            UpdateOne({"_id": task_id}, {"$set": {"subtask_count": total, "completed_subtask_count": completed[task_id]}})
+            for task_id, total in totals.items()
+        )
+        for start in range(0, len(updates), IMPORT_BATCH_SIZE):
+            await db["tasks"].bulk_write(updates[start:start + IMPORT_BATCH_SIZE], ordered=False)
+
+    def add_chat(self, data: dict):
+        chat_history[self.user_key].append({
+            "user_id": self.user_key,
+            "message": str(data.get("message", "")),
+            "response": str(data.get("response", "")),
+            "timestamp": data.get("timestamp") or datetime.utcnow().isoformat(),
+            "tasks": list(data.get("tasks") or []),
+        })
+        self.report["chat_messages"] += 1
+
+    async def flush(self, name: str, force: bool = False):
+        docs = self.pending[name]
+        if not docs or (len(docs) < IMPORT_BATCH_SIZE and not force):
+            return
+        self.pending[name] = []
+        if name == "tasks" and not await try_reserve_tasks(self.user_id, len(docs)):
+            self.report["over_quota"] += len(docs)
+            self.dropped_task_ids.update(doc["_id"] for doc in docs)
+            return
+        await db[name].insert_many(docs, ordered=False)
+        self.report[name] += len(docs)
+        if name == "tasks":
+            await adjust_tags(self.user_id, Counter(tag for doc in docs for tag in set(doc.get("tags") or [])))
+        logger.info(f"Import for user {self.user_key}: {self.report['projects']} projects, {self.report['tasks']} tasks inserted")
+
+    async def flush_all(self):
+        # Projects first so that remapped project ids exist before the tasks pointing at them
+        await self.flush("projects", force=True)
+        await self.flush("tasks", force=True)
+        await self.link_tasks()
+
+
+def _iter_lines(upload: UploadFile):
+    # The upload is spooled to disk by Starlette, so wrapping it keeps memory constant
+    return io.TextIOWrapper(upload.file, encoding="utf-8", newline="")
+
+
+def _parse_csv_row(row: dict) -> dict:
+    data = {key: value for key, value in row.items() if key and value not in (None, "")}
+    for key in ("tags", "attachments"):
+        if key in data:
+            data[key] = json.loads(data[key])
+    return data
+
+
+@router.post("/import")
+async def import_workspace(
+    file: UploadFile = File(...),
+    format: str = Query(None, pattern="^(ndjson|csv)$"),
+    collection: str = Query("tasks", pattern="^(tasks|projects)$"),
+    current_user=Depends(get_current_user)
+):
+    """Import an NDJSON or CSV export produced by `/api/export` in batches."""
+    if format is None:
+        format = "csv" if (file.filename or "").lower().endswith(".csv") else "ndjson"
+
+    user_id = current_user["_id"]
+    known = await db["projects"].distinct("_id", {"user_id": user_id, **ACTIVE})
+    state = _ImportState(user_id, {str(project_id) for project_id in known})
+
+    try:
+        if format == "csv":
+            reader = csv.DictReader(_iter_lines(file))
+            for line_no, row in enumerate(reader, start=2):
+                try:
+                    data = _parse_csv_row(row)
+                    if collection == "projects":
+                        state.add_project(data)
+                    else:
+                        state.add_task(data)
+                except (ValidationError, ValueError, HTTPException) as e:
+                    state.error(line_no, str(e))
+                await state.flush(collection)
+        else:
+            for line_no, line in enumerate(_iter_lines(file), start=1):
+                if not line.strip():
+                    continue
+                try:
+                    record = json.loads(line)
+                    kind, data = record.get("type"), record.get("data") or {}
+                    if kind == "project":
+                        state.add_project(data)
+                    elif kind == "task":
+                        # Flush buffered projects so remapped ids are persisted before dependent tasks
+                        await state.flush("projects", force=True)
+                        state.add_task(data)
+                    elif kind == "chat":
+                        state.add_chat(data)
+                    else:
+                        raise ValueError(f"Unknown record type: {kind}")
+                except (ValidationError, ValueError, AttributeError, HTTPException) as e:
+                    state.error(line_no, str(e))
+                await state.flush("projects")
+                await state.flush("tasks")
+        await state.flush_all()
+        if state.report["projects"]:
+            # New projects are owned by the user, so both the role map and the list change
+            await invalidate_access([state.user_id])
+    except UnicodeDecodeError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Import file must be UTF-8 encoded"
+        )
+    except Exception as e:
+        logger.error(f"Import failed for user {state.user_key}: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail={"message": "Import failed", "report": state.report}
+        )
+
+    return state.report
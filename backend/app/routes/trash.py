@@ -0,0 +1,72 @@
+from fastapi import APIRouter, Depends, Query
+from app.auth import get_current_user
+from app.config import settings
+from app.db import db, read_db
+from app.activity import record_activity
+from app.permissions import require_task_role, invalidate_access
+from app.routes.projects import project_audience
+from app.routes.tasks import serialize_task
+from app.schemas import TaskOut
+from app.trash import TRASHED, purge_at, restore_task, purge_task, restore_project, purge_project
+from app.utils import to_jsonable
+from bson import ObjectId
+
+router = APIRouter()
+
+def serialize_trashed(doc: dict) -> dict:
+    item = to_jsonable(doc)
+    item["id"] = item.pop("_id")
+    item.pop("user_id", None)
+    item["purge_at"] = to_jsonable(purge_at(doc["deleted_at"]))
+    return item
+
+async def _get_trashed_task(task_id: str, user) -> dict:
+    # Only the task that was deleted is listed; its subtasks come back with it
+    task = await db["tasks"].find_one({"_id": ObjectId(task_id), "deleted_by": {"$exists": True}, **TRASHED})
+    if not task or task["deleted_by"] != user["_id"]:
+        await require_task_role(user, task, "editor")
+    return task
+
+@router.get("/")
+async def list_trash(limit: int = Query(50, ge=1, le=200), current_user=Depends(get_current_user)):
+    """Trashed tasks the user created or deleted, and trashed projects they own, newest first."""
+    user_id = current_user["_id"]
+    tasks = await read_db["tasks"].find({"$or": [
+        {"user_id": user_id, "deleted_by": {"$exists": True}, **TRASHED},
+        {"deleted_by": user_id, **TRASHED},
+    ]}, max_time_ms=settings.mongo_query_timeout_ms).sort("deleted_at", -1).limit(limit).to_list(limit)
+    projects = await read_db["projects"].find(
+        {"user_id": user_id, **TRASHED}, max_time_ms=settings.mongo_query_timeout_ms
+    ).sort("deleted_at", -1).limit(limit).to_list(limit)
+    return {
+        "tasks": [serialize_trashed(serialize_task(task)) for task in tasks],
+        "projects": [serialize_trashed(project) for project in projects],
+    }
+
+@router.post("/tasks/{task_id}/restore", response_model=TaskOut)
+async def restore_trashed_task(task_id: str, current_user=Depends(get_current_user)):
+    task = await _get_trashed_task(task_id, current_user)
+    restored = await restore_task(task)
+    record_activity(current_user["_id"], "restored", "task", task["_id"])
+    return serialize_task(restored)
+
+@router.delete("/tasks/{task_id}")
+async def purge_trashed_task(task_id: str, current_user=Depends(get_current_user)):
+    """Delete a trashed task (and the subtasks trashed with it) now instead of waiting for the TTL."""
+    task = await _get_trashed_task(task_id, current_user)
+    await purge_task(task)
+    record_activity(current_user["_id"], "deleted", "task", task["_id"])
+    return {"ok": True}
+
+@router.post("/projects/{project_id}/restore")
+async def restore_trashed_project(project_id: str, current_user=Depends(get_current_user)):
+    await restore_project(ObjectId(project_id), current_user["_id"])
+    await invalidate_access(await project_audience(ObjectId(project_id)))
+    record_activity(current_user["_id"], "restored", "project", ObjectId(project_id))
+    return {"ok": True}
+
+@router.delete("/projects/{project_id}")
+async def purge_trashed_project(project_id: str, current_user=Depends(get_current_user)):
+    await purge_project(ObjectId(project_id), current_user["_id"])
+    record_activity(current_user["_id"], "deleted", "project", ObjectId(project_id))
+    return {"ok": True}
@@ -2,13 +2,15 @@ from fastapi import APIRouter, Depends, HTTPException
 from app.schemas import UserOut
 from app.auth import get_current_user
 from app.db import db
+from app.cache import user_cache
+from app.activity import record_activity
 from bson import ObjectId
 
 router = APIRouter()
 
 @router.get("/{user_id}", response_model=UserOut)
 async def get_user(user_id: str, current_user=Depends(get_current_user)):
-    user = await db["users"].find_one({"_id": ObjectId(user_id)})
+    user = await user_cache.get_or_load(user_id, lambda: db["users"].find_one({"_id": ObjectId(user_id)}))
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
     return {
@@ -23,6 +25,12 @@ async def update_user(user_id: str, user_update: UserOut, current_user=Depends(g
     if str(current_user["_id"]) != user_id:
         raise HTTPException(status_code=403, detail="Not allowed")
     await db["users"].update_one({"_id": ObjectId(user_id)}, {"$set": user_update.dict(exclude_unset=True)})
+    await user_cache.invalidate(user_id)
+    record_activity(current_user["_id"], "updated", "user", current_user["_id"], {
+        key: {"from": current_user.get(key), "to": value}
+        for key, value in user_update.dict(exclude_unset=True).items()
+        if current_user.get(key) != value
+    })
     user = await db["users"].find_one({"_id": ObjectId(user_id)})
     return {
         "id": str(user["_id"]),
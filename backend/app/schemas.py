@@ -1,5 +1,9 @@
-from pydantic import BaseModel, EmailStr, Field
-from typing import List, Optional
+from pydantic import BaseModel, EmailStr, Field, constr
+from typing import List, Optional, Union
+from app.config import settings
+
+# Upper bounds on list fields that are not covered by a configurable quota
+MAX_RELATIONS = 100
 
 class UserCreate(BaseModel):
     name: str
@@ -21,23 +25,70 @@ class Token(BaseModel):
     token_type: str = "bearer"
 
 class ProjectCreate(BaseModel):
+    name: str = Field(..., max_length=200)
+    description: Optional[str] = Field(None, max_length=settings.max_description_length)
+    color: str = Field(..., max_length=50)
+    icon: Optional[str] = Field(None, max_length=100)
+
+class ProjectOut(ProjectCreate):
+    id: str
+    # Input limits are not applied to stored data, which may predate them
     name: str
     description: Optional[str] = None
     color: str
     icon: Optional[str] = None
+    # The caller's role on the project: owner, editor or viewer
+    role: Optional[str] = None
 
-class ProjectOut(ProjectCreate):
+class ProjectMemberCreate(BaseModel):
+    email: EmailStr
+    role: str = Field("viewer", pattern="^(editor|viewer)$")
+
+class ProjectMemberOut(BaseModel):
+    user_id: str
+    name: str
+    email: EmailStr
+    role: str
+
+class AttachmentRef(BaseModel):
     id: str
+    filename: str
+    content_type: str
+    size: int
+    sha256: str
 
 class TaskCreate(BaseModel):
+    title: str = Field(..., max_length=500)
+    description: Optional[str] = Field(None, max_length=settings.max_description_length)
+    status: str = Field("todo", max_length=50)
+    priority: str = Field("medium", max_length=50)
+    due_date: Optional[str] = Field(None, max_length=50)
+    project_id: Optional[str] = None
+    tags: Optional[List[constr(max_length=50)]] = Field([], max_length=settings.max_tags_per_task)
+    assignee_ids: Optional[List[str]] = Field([], max_length=MAX_RELATIONS)
+    parent_id: Optional[str] = None
+    blocked_by: Optional[List[str]] = Field([], max_length=MAX_RELATIONS)
+
+class TaskOut(TaskCreate):
+    id: str
+    # Input limits are not applied to stored data, which may predate them
     title: str
     description: Optional[str] = None
     status: str = "todo"
     priority: str = "medium"
     due_date: Optional[str] = None
-    project_id: Optional[str] = None
     tags: Optional[List[str]] = []
-    attachments: Optional[List[str]] = []
+    assignee_ids: Optional[List[str]] = []
+    blocked_by: Optional[List[str]] = []
+    # Roll-up over the whole subtree, maintained on write
+    subtask_count: int = 0
+    completed_subtask_count: int = 0
+    # Attachments are managed through /api/tasks/{id}/attachments; older tasks may still hold plain URLs
+    attachments: List[Union[AttachmentRef, str]] = [] 
 
-class TaskOut(TaskCreate):
-    id: str 
\ No newline at end of file
+class NextTasksOut(BaseModel):
+    # Open tasks that can be started now, the full dependency order, and tasks that cannot be ordered
+    ready: List[TaskOut] = []
+    order: List[TaskOut] = []
+    externally_blocked: List[TaskOut] = []
+    cyclic: List[TaskOut] = []
@@ -0,0 +1,92 @@
+"""Per-user tag catalogue.
+
+Tags live as arrays on each task. The `tags` collection keeps one document
+per (user, tag) with the number of live tasks using it. That makes listing
+and autocompleting a user's tags an index range scan instead of a scan over
+all their tasks. Counts belong to the task's creator and are updated
+incrementally whenever task tags change, a task is created, trashed or
+restored, or tasks are imported. Entries whose count drops to zero are removed.
+"""
+from app.config import settings
+from app.db import db, read_db, ACTIVE
+from collections import Counter
+from datetime import datetime
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+import re
+
+CATALOGUE_MARKER = "tag_catalogue"
+
+
+async def adjust_tags(user_id, counts: Counter):
+    """Apply per-tag count deltas (`Counter({"work": 1, "home": -1})`) to a user's catalogue."""
+    counts = {name: delta for name, delta in counts.items() if delta}
+    if not counts:
+        return
+    updates = [
+        UpdateOne({"user_id": user_id, "name": name}, {"$inc": {"count": delta}}, upsert=True)
+        for name, delta in counts.items()
+    ]
+    try:
+        await db["tags"].bulk_write(updates, ordered=False)
+    except BulkWriteError as e:
+        # Two concurrent upserts of a new tag: the loser hits the unique index and is retried
+        retry = [updates[error["index"]] for error in e.details["writeErrors"] if error["code"] == 11000]
+        if len(retry) != len(e.details["writeErrors"]):
+            raise
+        await db["tags"].bulk_write(retry, ordered=False)
+    if any(delta < 0 for delta in counts.values()):
+        await db["tags"].delete_many({"user_id": user_id, "name": {"$in": list(counts)}, "count": {"$lte": 0}})
+
+
+def tag_changes(before, after) -> Counter:
+    """Count deltas for a task whose tags went from `before` to `after`."""
+    changes = Counter(set(after or []))
+    changes.subtract(set(before or []))
+    return changes
+
+
+async def adjust_tags_for_tasks(task_ids, direction: int):
+    """Add (+1) or remove (-1) the tags of many tasks at once, e.g. on trash and restore."""
+    groups = await db["tasks"].aggregate([
+        {"$match": {"_id": {"$in": list(task_ids)}, "tags.0": {"$exists": True}}},
+        # A tag repeated on one task counts once, as in tag_changes
+        {"$project": {"user_id": 1, "tags": {"$setUnion": ["$tags", []]}}},
+        {"$unwind": "$tags"},
+        {"$group": {"_id": {"user_id": "$user_id", "tag": "$tags"}, "count": {"$sum": 1}}},
+    ], maxTimeMS=settings.mongo_query_timeout_ms).to_list(None)
+    per_user = {}
+    for group in groups:
+        per_user.setdefault(group["_id"]["user_id"], Counter())[group["_id"]["tag"]] += direction * group["count"]
+    for user_id, counts in per_user.items():
+        await adjust_tags(user_id, counts)
+
+
+async def build_tag_catalogue():
+    """Build the catalogue from existing tasks once, for data that predates it."""
+    if await db["migrations"].find_one({"_id": CATALOGUE_MARKER}):
+        return
+    await db["tasks"].aggregate([
+        {"$match": {**ACTIVE, "tags.0": {"$exists": True}}},
+        {"$project": {"user_id": 1, "tags": {"$setUnion": ["$tags", []]}}},
+        {"$unwind": "$tags"},
+        {"$group": {"_id": {"user_id": "$user_id", "name": "$tags"}, "count": {"$sum": 1}}},
+        {"$project": {"_id": 0, "user_id": "$_id.user_id", "name": "$_id.name", "count": 1}},
+        {"$merge": {"into": "tags", "on": ["user_id", "name"], "whenMatched": "replace", "whenNotMatched": "insert"}},
+    ]).to_list(None)
+    await db["migrations"].insert_one({"_id": CATALOGUE_MARKER, "applied_at": datetime.utcnow()})
+
+
+async def search_tags(user_id, prefix: str = "", limit: int = 20) -> list:
+    """Tags starting with `prefix` in name order, or the most used tags when no prefix is given."""
+    if prefix:
+        # An anchored, case-sensitive regex becomes a range scan on the (user_id, name) index
+        query = {"user_id": user_id, "name": {"$regex": f"^{re.escape(prefix)}"}}
+        sort = [("name", 1)]
+    else:
+        query = {"user_id": user_id}
+        sort = [("count", -1), ("name", 1)]
+    cursor = read_db["tags"].find(
+        query, {"_id": 0, "name": 1, "count": 1}, max_time_ms=settings.mongo_query_timeout_ms
+    ).sort(sort).limit(limit)
+    return await cursor.to_list(limit)
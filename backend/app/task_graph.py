@@ -0,0 +1,177 @@
+"""Subtask hierarchy and blocking dependencies between tasks.
+
+`parent_id` links a subtask to its parent and `blocked_by` lists the tasks
+that must be done first. Each task keeps roll-up counters over its whole
+subtree (`subtask_count`, `completed_subtask_count`). Writes update these
+counters incrementally on the ancestors, so rendering a large tree never has
+to count descendants.
+"""
+from fastapi import HTTPException
+from app.config import settings
+from app.db import db, ACTIVE
+from bson import ObjectId
+import heapq
+
+DONE_STATUSES = {"done", "completed"}
+PRIORITY_RANK = {"high": 0, "medium": 1, "low": 2}
+
+
+def is_done(task: dict) -> bool:
+    return (task or {}).get("status") in DONE_STATUSES
+
+
+async def ancestor_ids(parent_id) -> list:
+    """`parent_id` followed by all of its ancestors, resolved in one $graphLookup."""
+    if not parent_id:
+        return []
+    result = await db["tasks"].aggregate([
+        {"$match": {"_id": parent_id}},
+        {"$graphLookup": {
+            "from": "tasks",
+            "startWith": "$parent_id",
+            "connectFromField": "parent_id",
+            "connectToField": "_id",
+            "as": "ancestors",
+        }},
+        {"$project": {"ancestors._id": 1}},
+    ], maxTimeMS=settings.mongo_query_timeout_ms).to_list(1)
+    if not result:
+        return []
+    return [parent_id] + [ancestor["_id"] for ancestor in result[0]["ancestors"]]
+
+
+async def adjust_rollup(parent_id, total_delta: int, done_delta: int):
+    """Apply a change in subtree size/completion to every ancestor starting at `parent_id`."""
+    if not parent_id or (not total_delta and not done_delta):
+        return
+    ancestors = await ancestor_ids(parent_id)
+    if ancestors:
+        await db["tasks"].update_many(
+            {"_id": {"$in": ancestors}},
+            {"$inc": {"subtask_count": total_delta, "completed_subtask_count": done_delta}}
+        )
+
+
+def subtree_weight(task: dict):
+    """(tasks, completed tasks) contributed by a task and its descendants to its ancestors."""
+    return (
+        1 + task.get("subtask_count", 0),
+        int(is_done(task)) + task.get("completed_subtask_count", 0),
+    )
+
+
+async def ensure_valid_parent(task_id, parent_id):
+    if parent_id is None or task_id is None:
+        return
+    if parent_id == task_id or task_id in await ancestor_ids(parent_id):
+        raise HTTPException(status_code=400, detail="A task cannot be nested under itself or its subtasks")
+
+
+async def ensure_no_dependency_cycle(task_id, blocked_by: list):
+    """Reject dependencies that would make a task (transitively) block itself."""
+    if not blocked_by or task_id is None:
+        return
+    if task_id in blocked_by:
+        raise HTTPException(status_code=400, detail="A task cannot block itself")
+    reachable = await db["tasks"].aggregate([
+        {"$match": {"_id": {"$in": blocked_by}}},
+        {"$graphLookup": {
+            "from": "tasks",
+            "startWith": "$blocked_by",
+            "connectFromField": "blocked_by",
+            "connectToField": "_id",
+            "as": "upstream",
+        }},
+        {"$match": {"upstream._id": task_id}},
+        {"$limit": 1},
+    ], maxTimeMS=settings.mongo_query_timeout_ms).to_list(1)
+    if reachable:
+        raise HTTPException(status_code=400, detail="Dependency would create a cycle")
+
+
+async def load_tree(root_id) -> dict:
+    """Fetch a task and all of its descendants in one query and nest them."""
+    result = await db["tasks"].aggregate([
+        {"$match": {"_id": root_id, **ACTIVE}},
+        {"$graphLookup": {
+            "from": "tasks",
+            "startWith": "$_id",
+            "connectFromField": "_id",
+            "connectToField": "parent_id",
+            "as": "descendants",
+            "depthField": "depth",
+            # Trashed subtasks (and everything under them) are left out
+            "restrictSearchWithMatch": ACTIVE,
+        }},
+    ], maxTimeMS=settings.mongo_query_timeout_ms).to_list(1)
+    if not result:
+        return None
+    root = result[0]
+    descendants = root.pop("descendants")
+    nodes = {root["_id"]: {**root, "subtasks": []}}
+    for task in sorted(descendants, key=lambda task: task["depth"]):
+        nodes[task["_id"]] = {**task, "subtasks": []}
+    for task in descendants:
+        parent = nodes.get(task.get("parent_id"))
+        if parent is not None:
+            parent["subtasks"].append(nodes[task["_id"]])
+    return nodes[root["_id"]]
+
+
+def _sort_key(task: dict):
+    # Tasks without a due date sort after dated ones
+    return (PRIORITY_RANK.get(task.get("priority"), 1), task.get("due_date") or "\uffff", str(task["_id"]))
+
+
+async def next_actions(open_tasks: list) -> dict:
+    """Order open tasks so every task comes after its blockers (Kahn's algorithm).
+
+    Among tasks that are ready at the same time, higher priority and earlier
+    due dates come first. Tasks left over (legacy cycles) are returned separately.
+    """
+    by_id = {task["_id"]: task for task in open_tasks}
+    # Blockers outside the open set are done, trashed or not visible; look up which are still open
+    external = {blocker for task in open_tasks for blocker in task.get("blocked_by") or [] if blocker not in by_id}
+    open_external = set()
+    if external:
+        open_external = set(await db["tasks"].distinct(
+            "_id", {"_id": {"$in": list(external)}, "status": {"$nin": list(DONE_STATUSES)}, **ACTIVE},
+            maxTimeMS=settings.mongo_query_timeout_ms
+        ))
+
+    pending = {}
+    dependents = {task_id: [] for task_id in by_id}
+    externally_blocked = set()
+    for task in open_tasks:
+        blockers = [blocker for blocker in task.get("blocked_by") or [] if blocker in by_id]
+        pending[task["_id"]] = len(blockers)
+        for blocker in blockers:
+            dependents[blocker].append(task["_id"])
+        if any(blocker in open_external for blocker in task.get("blocked_by") or []):
+            externally_blocked.add(task["_id"])
+
+    heap = [(_sort_key(by_id[task_id]), task_id) for task_id, count in pending.items() if count == 0]
+    heapq.heapify(heap)
+    order = []
+    while heap:
+        _, task_id = heapq.heappop(heap)
+        order.append(by_id[task_id])
+        for dependent in dependents[task_id]:
+            pending[dependent] -= 1
+            if pending[dependent] == 0:
+                heapq.heappush(heap, (_sort_key(by_id[dependent]), dependent))
+
+    ordered_ids = {task["_id"] for task in order}
+    ready = [task for task in order if not task.get("blocked_by") or all(
+        blocker not in by_id and blocker not in open_external for blocker in task["blocked_by"]
+    )]
+    return {
+        "ready": ready,
+        "order": order,
+        "externally_blocked": [by_id[task_id] for task_id in externally_blocked],
+        "cyclic": [task for task in open_tasks if task["_id"] not in ordered_ids],
+    }
+
+
+def to_object_ids(values) -> list:
+    return [ObjectId(value) for value in dict.fromkeys(values or [])]
@@ -0,0 +1,212 @@
+"""Soft-delete for tasks and projects.
+
+Deleting a task or project sets `deleted_at` instead of removing the document,
+so it can be restored with its original id and references. Live documents store
+`deleted_at: null`. Every read of live data filters on `ACTIVE`, which matches
+the partial indexes in `app.indexes`. `sweep_trash` purges trashed documents
+after `settings.trash_retention_days` and releases their attachment files. A TTL
+index on `deleted_at` one day later is a backstop for anything the sweep missed.
+
+Trashing a task also trashes its live subtasks. They are marked with
+`deleted_with` (the id of the task that was deleted) and are restored or purged
+together with it. Only that task carries `deleted_by` and shows up in the trash.
+"""
+from fastapi import HTTPException
+from motor.motor_asyncio import AsyncIOMotorGridFSBucket
+from gridfs.errors import NoFile
+from app.db import db, get_database, ACTIVE, TRASHED
+from app.config import settings
+from app.task_graph import adjust_rollup, subtree_weight
+from app.quotas import reserve_for_tasks, release_for_tasks
+from app.tags import adjust_tags_for_tasks
+from bson import ObjectId
+from datetime import datetime, timedelta
+import asyncio
+import logging
+
+logger = logging.getLogger(__name__)
+
+SOFT_DELETE_COLLECTIONS = ("tasks", "projects", "project_members")
+BACKFILL_MARKER = "soft_delete_backfill"
+ATTACHMENT_BUCKET = "attachments"
+# Seconds between sweeps for trash past its retention period
+TRASH_SWEEP_INTERVAL = 3600
+
+
+def owner_query(collection: str, user_id) -> dict:
+    """All of a user's documents, live or trashed, in a form the partial indexes can serve."""
+    if collection in ("tasks", "projects"):
+        return {"$or": [{"user_id": user_id, **ACTIVE}, {"user_id": user_id, **TRASHED}]}
+    return {"user_id": user_id}
+
+
+def purge_at(deleted_at: datetime) -> datetime:
+    return deleted_at + timedelta(days=settings.trash_retention_days)
+
+
+async def backfill_deleted_at():
+    """Give documents created before soft-delete an explicit `deleted_at: null` (runs once)."""
+    if await db["migrations"].find_one({"_id": BACKFILL_MARKER}):
+        return
+    for collection in SOFT_DELETE_COLLECTIONS:
+        result = await db[collection].update_many({"deleted_at": {"$exists": False}}, {"$set": {"deleted_at": None}})
+        if result.modified_count:
+            logger.info(f"Backfilled deleted_at on {result.modified_count} {collection}")
+    await db["migrations"].insert_one({"_id": BACKFILL_MARKER, "applied_at": datetime.utcnow()})
+
+
+async def live_descendant_ids(task_id) -> list:
+    """Ids of all live subtasks below a task, resolved in one $graphLookup."""
+    result = await db["tasks"].aggregate([
+        {"$match": {"_id": task_id}},
+        {"$graphLookup": {
+            "from": "tasks",
+            "startWith": "$_id",
+            "connectFromField": "_id",
+            "connectToField": "parent_id",
+            "as": "descendants",
+            "restrictSearchWithMatch": ACTIVE,
+        }},
+        {"$project": {"descendants._id": 1}},
+    ], maxTimeMS=settings.mongo_query_timeout_ms).to_list(1)
+    return [task["_id"] for task in result[0]["descendants"]] if result else []
+
+
+async def trash_task(task: dict, user_id) -> datetime:
+    """Move a task and its live subtasks to the trash and take them out of the ancestors' roll-ups."""
+    now = datetime.utcnow()
+    descendants = await live_descendant_ids(task["_id"])
+    result = await db["tasks"].update_one(
+        {"_id": task["_id"], **ACTIVE},
+        {"$set": {"deleted_at": now, "deleted_by": user_id}}
+    )
+    if result.modified_count == 0:
+        raise HTTPException(status_code=404, detail="Task not found")
+    if descendants:
+        await db["tasks"].update_many(
+            {"_id": {"$in": descendants}, **ACTIVE},
+            {"$set": {"deleted_at": now, "deleted_with": task["_id"]}}
+        )
+    total, done = subtree_weight(task)
+    await adjust_rollup(task.get("parent_id"), -total, -done)
+    await release_for_tasks([task["_id"]] + descendants)
+    await adjust_tags_for_tasks([task["_id"]] + descendants, -1)
+    return now
+
+
+async def restore_task(task: dict) -> dict:
+    """Bring a trashed task and the subtasks trashed with it back.
+
+    If the parent is no longer live, the task is restored at the top level.
+    """
+    restored_ids = [task["_id"]] + await db["tasks"].distinct(
+        "_id", {"deleted_with": task["_id"]}, maxTimeMS=settings.mongo_query_timeout_ms
+    )
+    await reserve_for_tasks(restored_ids)
+    parent_id = task.get("parent_id")
+    if parent_id and not await db["tasks"].count_documents({"_id": parent_id, **ACTIVE}, limit=1):
+        parent_id = None
+    result = await db["tasks"].update_one(
+        {"_id": task["_id"], **TRASHED},
+        {"$set": {"deleted_at": None, "parent_id": parent_id}, "$unset": {"deleted_by": ""}}
+    )
+    if result.modified_count == 0:
+        await release_for_tasks(restored_ids)
+        raise HTTPException(status_code=404, detail="Task not found in trash")
+    await db["tasks"].update_many(
+        {"deleted_with": task["_id"]},
+        {"$set": {"deleted_at": None}, "$unset": {"deleted_with": ""}}
+    )
+    total, done = subtree_weight(task)
+    await adjust_rollup(parent_id, total, done)
+    await adjust_tags_for_tasks(restored_ids, 1)
+    return {**task, "parent_id": parent_id, "deleted_at": None}
+
+
+def attachment_ids(tasks) -> list:
+    """Stored file ids referenced by the `attachments` of `tasks`."""
+    return [
+        ref["id"] for task in tasks for ref in task.get("attachments") or [] if isinstance(ref, dict) and ref.get("id")
+    ]
+
+
+async def release_attachments(file_ids):
+    """Delete the stored files of removed attachment refs that no task references any more."""
+    if not file_ids:
+        return
+    bucket = AsyncIOMotorGridFSBucket(get_database(), bucket_name=ATTACHMENT_BUCKET)
+    for attachment_id in set(file_ids):
+        # The stored file may be shared by other tasks through content dedup
+        still_used = await db["tasks"].count_documents(
+            {"attachments.id": attachment_id}, limit=1, maxTimeMS=settings.mongo_query_timeout_ms
+        )
+        if not still_used:
+            try:
+                await bucket.delete(ObjectId(attachment_id))
+            except NoFile:
+                pass
+
+
+async def purge_task(task: dict):
+    """Permanently delete a trashed task and the subtasks trashed with it, and their attachment files."""
+    purged = await db["tasks"].find(
+        {"$or": [{"_id": task["_id"]}, {"deleted_with": task["_id"]}]},
+        {"attachments.id": 1}, max_time_ms=settings.mongo_query_timeout_ms
+    ).to_list(None)
+    ids = [doc["_id"] for doc in purged] or [task["_id"]]
+    await db["tasks"].delete_many({"_id": {"$in": ids}})
+    await db["tasks"].update_many({"blocked_by": {"$in": ids}}, {"$pull": {"blocked_by": {"$in": ids}}})
+    await release_attachments(attachment_ids(purged))
+
+
+async def trash_project(project_id, user_id) -> datetime:
+    now = datetime.utcnow()
+    result = await db["projects"].update_one(
+        {"_id": project_id, "user_id": user_id, **ACTIVE},
+        {"$set": {"deleted_at": now, "deleted_by": user_id}}
+    )
+    if result.modified_count == 0:
+        raise HTTPException(status_code=404, detail="Project not found")
+    # Memberships expire with the project, so shared users lose access until it is restored
+    await db["project_members"].update_many({"project_id": project_id, **ACTIVE}, {"$set": {"deleted_at": now}})
+    return now
+
+
+async def restore_project(project_id, user_id):
+    result = await db["projects"].update_one(
+        {"_id": project_id, "user_id": user_id, **TRASHED},
+        {"$set": {"deleted_at": None}, "$unset": {"deleted_by": ""}}
+    )
+    if result.modified_count == 0:
+        raise HTTPException(status_code=404, detail="Project not found in trash")
+    await db["project_members"].update_many({"project_id": project_id, **TRASHED}, {"$set": {"deleted_at": None}})
+
+
+async def purge_project(project_id, user_id):
+    result = await db["projects"].delete_one({"_id": project_id, "user_id": user_id, **TRASHED})
+    if result.deleted_count == 0:
+        raise HTTPException(status_code=404, detail="Project not found in trash")
+    await db["project_members"].delete_many({"project_id": project_id})
+
+
+async def purge_expired_trash():
+    """Purge every task and project that has been in the trash longer than the retention period."""
+    cutoff = datetime.utcnow() - timedelta(days=settings.trash_retention_days)
+    # $lt on a date never matches deleted_at: null
+    expired = {"deleted_by": {"$exists": True}, "deleted_at": {"$lt": cutoff}}
+    async for task in db["tasks"].find(expired, {"_id": 1}):
+        await purge_task(task)
+    async for project in db["projects"].find(expired, {"_id": 1, "user_id": 1}):
+        await purge_project(project["_id"], project["user_id"])
+
+
+async def sweep_trash():
+    """Run `purge_expired_trash` periodically for the lifetime of the app."""
+    while True:
+        try:
+            await purge_expired_trash()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.warning(f"Could not purge expired trash: {e}")
+        await asyncio.sleep(TRASH_SWEEP_INTERVAL)
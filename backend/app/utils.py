@@ -1 +1,16 @@
-# Utility functions can be added here as needed 
\ No newline at end of file
+# Utility functions can be added here as needed
+from datetime import datetime
+from bson import ObjectId
+
+
+def to_jsonable(value):
+    """Convert Mongo values (ObjectId, datetime, nested docs) into JSON-safe values."""
+    if isinstance(value, ObjectId):
+        return str(value)
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, dict):
+        return {key: to_jsonable(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [to_jsonable(item) for item in value]
+    return value
@@ -0,0 +1,404 @@
+"""Load-test and benchmark harness for the API hot paths.
+
+Seeds a database with N users x M tasks/projects, drives `app.main:app`
+in-process through `httpx.AsyncClient` and reports throughput and latency
+percentiles per scenario. Results can be written as JSON and compared to a
+previous run to catch performance regressions between releases.
+
+Usage (from the backend directory):
+
+    python -m benchmarks.bench_api --mock --users 20 --tasks 200 --requests 500
+    python -m benchmarks.bench_api --mongodb-url mongodb://localhost:27017 --output bench.json
+    python -m benchmarks.bench_api --mock --baseline bench.json --threshold 0.15
+    python -m benchmarks.bench_api --mongodb-url mongodb://localhost:27017 --scenarios login --transfer-tasks 1000000
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import resource
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+import httpx
+from bson import ObjectId
+
+BENCH_PASSWORD = "bench-password"
+SCENARIOS = ["login", "list_tasks", "create_task", "update_task", "mentor", "delete_account"]
+# delete_account polls the deletion job at this interval until it finishes, for at most DELETION_TIMEOUT seconds
+DELETION_POLL_INTERVAL = 0.01
+DELETION_TIMEOUT = 60
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the To-Do API hot paths")
+    parser.add_argument("--mock", action="store_true", help="Use mongomock-motor instead of a real MongoDB")
+    parser.add_argument("--mongodb-url", default="mongodb://localhost:27017")
+    parser.add_argument("--database", default="tasksphere_bench", help="Database to seed (dropped before the run)")
+    parser.add_argument("--users", type=int, default=20, help="Number of seeded users")
+    parser.add_argument("--tasks", type=int, default=100, help="Tasks per user")
+    parser.add_argument("--projects", type=int, default=5, help="Projects per user")
+    parser.add_argument("--requests", type=int, default=200, help="Requests per scenario")
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS), help="Comma separated subset of scenarios")
+    parser.add_argument("--seed", type=int, default=42, help="Random seed for reproducible runs")
+    parser.add_argument("--ai-warmup", action="store_true", help="Load the AI models in the background during the run")
+    parser.add_argument("--transfer-tasks", type=int, default=0,
+                        help="Also import then export an NDJSON file with this many generated tasks (e.g. 1000000)")
+    parser.add_argument("--importtime", action="store_true", help="Also profile the import cost of app.main")
+    parser.add_argument("--output", help="Write results as JSON to this path")
+    parser.add_argument("--baseline", help="Compare against a previous JSON result")
+    parser.add_argument("--threshold", type=float, default=0.10,
+                        help="Allowed relative p95/throughput regression before failing (default 10%%)")
+    return parser.parse_args(argv)
+
+
+async def seed(database, args, rng):
+    from app.auth import get_password_hash
+
+    # bcrypt is deliberately slow; hash once and share it across seeded users
+    hashed = get_password_hash(BENCH_PASSWORD)
+    # Extra users are consumed by the delete_account scenario, plus one for the import/export run
+    total_users = args.users + args.requests + 1
+    users = [
+        {"_id": ObjectId(), "name": f"bench{i}", "email": f"bench{i}@example.com", "hashed_password": hashed, "avatar": None}
+        for i in range(total_users)
+    ]
+    await database["users"].insert_many(users)
+    for user in users:
+        projects = [
+            {"_id": ObjectId(), "name": f"Project {j}", "description": None, "color": "#3b82f6", "icon": None, "user_id": user["_id"],
+             "deleted_at": None}
+            for j in range(args.projects)
+        ]
+        if projects:
+            await database["projects"].insert_many(projects)
+        tasks = [
+            {
+                "title": f"Task {k}",
+                "description": "Seeded by the benchmark harness",
+                "status": rng.choice(["todo", "in_progress", "done"]),
+                "priority": rng.choice(["low", "medium", "high"]),
+                "due_date": None,
+                "project_id": rng.choice(projects)["_id"] if projects else None,
+                "tags": rng.sample(["work", "home", "urgent", "later", "errand"], 2),
+                "attachments": [],
+                "user_id": user["_id"],
+                "deleted_at": None,
+            }
+            for k in range(args.tasks)
+        ]
+        if tasks:
+            await database["tasks"].insert_many(tasks)
+    return users
+
+
+async def run_scenario(name, make_request, count, concurrency):
+    latencies, errors = [], 0
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one(i):
+        nonlocal errors
+        async with semaphore:
+            start = time.perf_counter()
+            try:
+                response = await make_request(i)
+                ok = response.status_code < 400
+            except Exception:
+                ok = False
+            latencies.append(time.perf_counter() - start)
+            if not ok:
+                errors += 1
+
+    wall_start = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(count)))
+    wall = time.perf_counter() - wall_start
+    return summarize(name, latencies, errors, wall)
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, int(round(pct / 100 * len(ordered))) - 1))
+    return ordered[index]
+
+
+def summarize(name, latencies, errors, wall):
+    return {
+        "scenario": name,
+        "requests": len(latencies),
+        "errors": errors,
+        "throughput_rps": round(len(latencies) / wall, 2) if wall else 0.0,
+        "mean_ms": round(statistics.fmean(latencies) * 1000, 3) if latencies else 0.0,
+        "p50_ms": round(percentile(latencies, 50) * 1000, 3),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 3),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 3),
+    }
+
+
+def build_scenarios(http, users, tokens, task_ids, args, rng):
+    bench_users = users[:args.users]
+    doomed_users = users[args.users:args.users + args.requests]
+
+    def auth(i):
+        user = bench_users[i % len(bench_users)]
+        return user, {"Authorization": f"Bearer {tokens[user['_id']]}"}
+
+    async def login(i):
+        user = rng.choice(bench_users)
+        return await http.post("/api/auth/login", json={"email": user["email"], "password": BENCH_PASSWORD})
+
+    async def list_tasks(i):
+        _, headers = auth(i)
+        return await http.get("/api/tasks/", headers=headers)
+
+    async def create_task(i):
+        user, headers = auth(i)
+        response = await http.post("/api/tasks/", headers=headers, json={"title": f"Bench task {i}", "tags": ["bench"]})
+        if response.status_code < 400:
+            task_ids.setdefault(user["_id"], []).append(response.json()["id"])
+        return response
+
+    async def update_task(i):
+        user, headers = auth(i)
+        task_id = rng.choice(task_ids[user["_id"]])
+        # A unique title guarantees the update modifies the document
+        return await http.put(f"/api/tasks/{task_id}", headers=headers,
+                              json={"title": f"Updated {i}-{time.perf_counter_ns()}", "status": "in_progress"})
+
+    async def mentor(i):
+        _, headers = auth(i)
+        return await http.post("/api/ai/mentor", headers=headers,
+                               json={"text": "How can I be more productive?", "tasks": ["Write report", "Review code"]})
+
+    async def delete_account(i):
+        """Schedule the deletion and wait for the background purge, so the purge itself is timed."""
+        user = doomed_users[i % len(doomed_users)]
+        response = await http.delete("/api/auth/me", headers={"Authorization": f"Bearer {tokens[user['_id']]}"})
+        if response.status_code >= 400:
+            return response
+        status_url = response.json()["status_url"]
+        deadline = time.perf_counter() + DELETION_TIMEOUT
+        while time.perf_counter() < deadline:
+            response = await http.get(status_url)
+            if response.status_code >= 400:
+                return response
+            job = response.json()
+            if job["status"] == "completed":
+                return response
+            if job["status"] == "failed":
+                # Counted as an error by run_scenario
+                raise RuntimeError(f"Deletion job failed: {job.get('error')}")
+            await asyncio.sleep(DELETION_POLL_INTERVAL)
+        raise TimeoutError("Deletion job did not finish")
+
+    return {
+        "login": login,
+        "list_tasks": list_tasks,
+        "create_task": create_task,
+        "update_task": update_task,
+        "mentor": mentor,
+        "delete_account": delete_account,
+    }
+
+
+def peak_rss_mb():
+    # ru_maxrss is reported in kilobytes on Linux
+    return round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+
+
+def write_import_file(path, task_count, rng, projects=20):
+    """Write an NDJSON export with `task_count` tasks; every tenth task is a subtask of the one before."""
+    with open(path, "w") as fh:
+        project_ids = [str(ObjectId()) for _ in range(projects)]
+        for project_id in project_ids:
+            fh.write(json.dumps({"type": "project", "data": {"id": project_id, "name": "Imported", "color": "#3b82f6"}}) + "\n")
+        previous = None
+        for k in range(task_count):
+            task_id = str(ObjectId())
+            fh.write(json.dumps({"type": "task", "data": {
+                "id": task_id,
+                "title": f"Imported task {k}",
+                "status": rng.choice(["todo", "in_progress", "done"]),
+                "priority": rng.choice(["low", "medium", "high"]),
+                "project_id": rng.choice(project_ids),
+                "tags": rng.sample(["work", "home", "urgent", "later", "errand"], 2),
+                "parent_id": previous if k % 10 == 9 else None,
+            }}) + "\n")
+            previous = task_id
+
+
+async def run_transfer(http, headers, task_count, rng):
+    """Import a generated file of `task_count` tasks, then stream it back out, recording time and peak memory."""
+    results = []
+    fd, path = tempfile.mkstemp(suffix=".ndjson")
+    os.close(fd)
+    try:
+        write_import_file(path, task_count, rng)
+        size_mb = os.path.getsize(path) / 1024 / 1024
+
+        start = time.perf_counter()
+        with open(path, "rb") as fh:
+            response = await http.post("/api/import", headers=headers, timeout=None,
+                                       files={"file": ("bench.ndjson", fh, "application/x-ndjson")})
+        elapsed = time.perf_counter() - start
+        report = response.json() if response.status_code < 400 else {}
+        ok = response.status_code < 400 and report.get("tasks") == task_count
+        results.append({**summarize("import", [elapsed], 0 if ok else 1, elapsed),
+                        "tasks_per_s": round(task_count / elapsed, 1), "file_mb": round(size_mb, 1), "peak_rss_mb": peak_rss_mb()})
+
+        start = time.perf_counter()
+        exported = 0
+        async with http.stream("GET", "/api/export?format=ndjson", headers=headers, timeout=None) as response:
+            async for line in response.aiter_lines():
+                exported += line.startswith('{"type": "task"')
+        elapsed = time.perf_counter() - start
+        ok = response.status_code < 400 and exported >= task_count
+        results.append({**summarize("export", [elapsed], 0 if ok else 1, elapsed),
+                        "tasks_per_s": round(exported / elapsed, 1), "peak_rss_mb": peak_rss_mb()})
+    finally:
+        os.remove(path)
+    return results
+
+
+def error_rate(result) -> float:
+    return result.get("errors", 0) / result["requests"] if result.get("requests") else 0.0
+
+
+def compare(results, baseline, threshold):
+    """Return a list of human readable regressions against a baseline result.
+
+    A scenario with failed requests is a regression on its own: error responses
+    are often fast, so latency alone would hide them.
+    """
+    regressions = []
+    previous = {item["scenario"]: item for item in baseline.get("results", [])}
+    for item in results:
+        if item["errors"]:
+            regressions.append(f"{item['scenario']}: {item['errors']}/{item['requests']} requests failed")
+        before = previous.get(item["scenario"])
+        if not before:
+            continue
+        if error_rate(item) > error_rate(before):
+            regressions.append(f"{item['scenario']}: error rate {error_rate(before):.1%} -> {error_rate(item):.1%}")
+        if item["errors"]:
+            # Latency of a run with failures is not comparable
+            continue
+        if before["p95_ms"] and item["p95_ms"] > before["p95_ms"] * (1 + threshold):
+            regressions.append(f"{item['scenario']}: p95 {before['p95_ms']}ms -> {item['p95_ms']}ms")
+        if before["throughput_rps"] and item["throughput_rps"] < before["throughput_rps"] * (1 - threshold):
+            regressions.append(f"{item['scenario']}: throughput {before['throughput_rps']} -> {item['throughput_rps']} req/s")
+    return regressions
+
+
+def compare_import_time(current, baseline, threshold):
+    before = (baseline.get("import_time") or {}).get("total_ms")
+    if not current or not before:
+        return []
+    if current["total_ms"] > before * (1 + threshold):
+        return [f"import time {before}ms -> {current['total_ms']}ms"]
+    return []
+
+
+async def main(args):
+    rng = random.Random(args.seed)
+    import_time = None
+    if args.importtime:
+        from benchmarks.importtime import profile_imports
+        # Profiled in a fresh interpreter before this process imports the app
+        import_time = profile_imports()
+        print(f"import app.main  {import_time['total_ms']:.1f} ms")
+        for entry in import_time["slowest"][:5]:
+            print(f"  {entry['cumulative_ms']:>9.1f} ms  {entry['module']}")
+
+    if args.mock:
+        from mongomock_motor import AsyncMongoMockClient
+        client = AsyncMongoMockClient()
+    else:
+        from motor.motor_asyncio import AsyncIOMotorClient
+        client = AsyncIOMotorClient(args.mongodb_url)
+    await client.drop_database(args.database)
+    if args.mock:
+        import mongomock.filtering
+        # mongomock leaves $type "null" unimplemented; match explicit nulls only, as MongoDB does,
+        # so the app's soft-delete filters behave the same as in production
+        mongomock.filtering.TYPE_MAP["null"] = lambda value: value is None
+    import app.db
+    from app.config import settings
+    settings.ai_warmup = args.ai_warmup
+    if args.transfer_tasks:
+        settings.quota_max_tasks = max(settings.quota_max_tasks, args.transfer_tasks + args.tasks)
+    # Installing the client up front makes the app lifespan reuse it instead of connecting itself
+    database = app.db.connect(client, args.database)
+
+    from app.main import app
+    from app.auth import create_access_token
+    if args.mock:
+        # GridFS needs a real pymongo Database. Seeded tasks have no attachments, so there are
+        # no files to release; stub it so the deletion path never reaches the GridFS bucket.
+        from app import account_deletion
+
+        async def skip_release_attachments(file_ids):
+            if file_ids:
+                raise RuntimeError("Attachment files cannot be released under --mock")
+
+        account_deletion.release_attachments = skip_release_attachments
+
+    users = await seed(database, args, rng)
+    tokens = {user["_id"]: create_access_token({"sub": str(user["_id"])}) for user in users}
+    task_ids = {}
+    async for task in database["tasks"].find({}, {"_id": 1, "user_id": 1}):
+        task_ids.setdefault(task["user_id"], []).append(str(task["_id"]))
+
+    selected = [name.strip() for name in args.scenarios.split(",") if name.strip()]
+    results = []
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as http:
+            scenarios = build_scenarios(http, users, tokens, task_ids, args, rng)
+            for name in selected:
+                if name not in scenarios:
+                    raise SystemExit(f"Unknown scenario: {name}")
+                result = await run_scenario(name, scenarios[name], args.requests, args.concurrency)
+                results.append(result)
+                print(f"{name:<16} {result['throughput_rps']:>9.1f} req/s  p50 {result['p50_ms']:>8.2f}ms  "
+                      f"p95 {result['p95_ms']:>8.2f}ms  p99 {result['p99_ms']:>8.2f}ms  errors {result['errors']}")
+            if args.transfer_tasks:
+                # The import goes to a fresh account so quota and existing data do not interfere
+                transfer_user = users[-1]
+                headers = {"Authorization": f"Bearer {tokens[transfer_user['_id']]}"}
+                for result in await run_transfer(http, headers, args.transfer_tasks, rng):
+                    results.append(result)
+                    print(f"{result['scenario']:<16} {result['tasks_per_s']:>9.1f} tasks/s  total {result['p50_ms'] / 1000:>8.2f}s  "
+                          f"peak RSS {result['peak_rss_mb']} MB  errors {result['errors']}")
+
+    report = {
+        "created_at": datetime.utcnow().isoformat(),
+        "config": {key: getattr(args, key) for key in ("mock", "users", "tasks", "projects", "requests", "concurrency", "seed", "transfer_tasks")},
+        "results": results,
+        "import_time": import_time,
+    }
+    if args.output:
+        with open(args.output, "w") as fh:
+            json.dump(report, fh, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as fh:
+            baseline = json.load(fh)
+        regressions = compare(results, baseline, args.threshold) + compare_import_time(import_time, baseline, args.threshold)
+        if regressions:
+            print("Performance regressions detected:")
+            for line in regressions:
+                print(f"  - {line}")
+            return 1
+        print("No regressions against baseline.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main(parse_args())))
@@ -0,0 +1,73 @@
+"""Summarise `python -X importtime` for the application entry point.
+
+Usage (from the backend directory):
+
+    python -m benchmarks.importtime --top 15
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def profile_imports(module: str = "app.main", top: int = 15) -> dict:
+    """Import `module` in a fresh interpreter and report the slowest top-level imports."""
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=BACKEND_DIR,
+        capture_output=True,
+        text=True,
+    )
+    if proc.returncode != 0:
+        raise RuntimeError(f"Importing {module} failed:\n{proc.stderr[-2000:]}")
+
+    entries = []
+    for line in proc.stderr.splitlines():
+        # Format: "import time:  self [us] | cumulative | imported package"
+        if not line.startswith("import time:") or "imported package" in line:
+            continue
+        fields = line[len("import time:"):].split("|")
+        if len(fields) != 3:
+            continue
+        name = fields[2].rstrip()
+        depth = (len(name) - len(name.lstrip())) // 2
+        entries.append({
+            "module": name.strip(),
+            "self_ms": int(fields[0]) / 1000,
+            "cumulative_ms": int(fields[1]) / 1000,
+            "depth": depth,
+        })
+
+    # Depth 0 entries partition the whole import, so their sum is the total
+    top_level = [entry for entry in entries if entry["depth"] == 0]
+    slowest = sorted(top_level, key=lambda entry: entry["cumulative_ms"], reverse=True)[:top]
+    return {
+        "module": module,
+        "total_ms": round(sum(entry["cumulative_ms"] for entry in top_level), 1),
+        "modules_imported": len(entries),
+        "slowest": [{key: entry[key] for key in ("module", "cumulative_ms", "self_ms")} for entry in slowest],
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Import-time profile of the API")
+    parser.add_argument("--module", default="app.main")
+    parser.add_argument("--top", type=int, default=15)
+    parser.add_argument("--json", action="store_true", help="Print the report as JSON")
+    args = parser.parse_args(argv)
+
+    report = profile_imports(args.module, args.top)
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return 0
+    print(f"{report['module']}: {report['total_ms']} ms across {report['modules_imported']} modules")
+    for entry in report["slowest"]:
+        print(f"  {entry['cumulative_ms']:>9.1f} ms  {entry['module']}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
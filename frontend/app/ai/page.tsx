@@ -3,7 +3,7 @@
 import { useState, useEffect, useRef, useCallback } from 'react';
 import { AppShell } from '@/components/layout/app-shell';
 import { useAuth } from '@/lib/auth/auth-context';
-import { sendMessage, getChatHistory, clearChatHistory, AIMessage, AIMessageRequest } from '@/lib/ai/ai-service';
+import { streamMessage, getChatHistory, clearChatHistory, AIMessage, AIMessageRequest } from '@/lib/ai/ai-service';
 import { Button } from '@/components/ui/button';
 import { Input } from '@/components/ui/input';
 import { Card, CardContent } from '@/components/ui/card';
@@ -198,23 +198,41 @@ export default function AIPage() {
           tasks: tasksForBackend
         };
 
-        const assistantResponseText = await sendMessage(messageRequest, controller.signal);
+        const assistantId = `ai-${Date.now()}`;
+        let started = false;
 
-        // Update messages state with user message and assistant response
-        setMessages(prev => prev.map(msg => 
-          msg.id === tempId 
-            ? { ...msg, isSending: false, error: undefined } // Clear sending state on user message
-            : msg
-        ));
-        
-        const assistantMessage: Message = {
-          id: `ai-${Date.now()}`,
-          content: assistantResponseText,
-          role: 'assistant',
-          timestamp: new Date().toISOString(),
-        };
+        // Show the answer as it streams in, starting with the first token
+        const assistantResponseText = await streamMessage(messageRequest, (chunk) => {
+          if (!started) {
+            started = true;
+            const assistantMessage: Message = {
+              id: assistantId,
+              content: chunk,
+              role: 'assistant',
+              timestamp: new Date().toISOString(),
+            };
+            // Clear sending state on user message and add the assistant response
+            setMessages(prev => [
+              ...prev.map(msg => msg.id === tempId ? { ...msg, isSending: false, error: undefined } : msg),
+              assistantMessage,
+            ]);
+            return;
+          }
+          setMessages(prev => prev.map(msg =>
+            msg.id === assistantId ? { ...msg, content: msg.content + chunk } : msg
+          ));
+        }, controller.signal);
 
-        setMessages(prev => [...prev, assistantMessage]);
+        if (!started) {
+          setMessages(prev => [
+            ...prev.map(msg => msg.id === tempId ? { ...msg, isSending: false, error: undefined } : msg),
+            { id: assistantId, content: assistantResponseText, role: 'assistant', timestamp: new Date().toISOString() },
+          ]);
+        } else {
+          setMessages(prev => prev.map(msg =>
+            msg.id === assistantId ? { ...msg, content: assistantResponseText } : msg
+          ));
+        }
 
         setUserScrolled(false);
 
@@ -176,6 +176,41 @@ export async function getChatHistory(): Promise<AIMessage[]> {
   return historyResponse.messages as AIMessage[];
 }
 
+// Map a failed mentor response to an AIError
+async function toAIError(response: Response): Promise<AIError> {
+  const errorText = await response.text();
+  let errorMessage = 'Failed to send message';
+  let errorType: 'validation' | 'network' | 'auth' | 'server' | 'unknown' = 'unknown';
+
+  // Map HTTP status codes to error types
+  switch (response.status) {
+    case 400:
+      errorType = 'validation';
+      errorMessage = errorText || 'Invalid request format';
+      break;
+    case 401:
+      errorType = 'auth';
+      errorMessage = 'Authentication failed. Please log in again.';
+      break;
+    case 422:
+      errorType = 'validation';
+      errorMessage = errorText || 'Invalid message format';
+      break;
+    case 429:
+      errorType = 'server';
+      errorMessage = 'Rate limit exceeded. Please try again later.';
+      break;
+    case 500:
+      errorType = 'server';
+      errorMessage = 'Server error. Please try again later.';
+      break;
+    default:
+      errorMessage = errorText || 'An unexpected error occurred';
+  }
+
+  return new AIError(errorMessage, errorType, response.status);
+}
+
 export async function sendMessage(
   message: string | AIMessageRequest,
   signal?: AbortSignal
@@ -207,37 +242,7 @@ export async function sendMessage(
     });
 
     if (!response.ok) {
-      const errorText = await response.text();
-      let errorMessage = 'Failed to send message';
-      let errorType: 'validation' | 'network' | 'auth' | 'server' | 'unknown' = 'unknown';
-
-      // Map HTTP status codes to error types
-      switch (response.status) {
-        case 400:
-          errorType = 'validation';
-          errorMessage = errorText || 'Invalid request format';
-          break;
-        case 401:
-          errorType = 'auth';
-          errorMessage = 'Authentication failed. Please log in again.';
-          break;
-        case 422:
-          errorType = 'validation';
-          errorMessage = errorText || 'Invalid message format';
-          break;
-        case 429:
-          errorType = 'server';
-          errorMessage = 'Rate limit exceeded. Please try again later.';
-          break;
-        case 500:
-          errorType = 'server';
-          errorMessage = 'Server error. Please try again later.';
-          break;
-        default:
-          errorMessage = errorText || 'An unexpected error occurred';
-      }
-
-      throw new AIError(errorMessage, errorType, response.status);
+      throw await toAIError(response);
     }
     
     // Parse the response body and return the assistant's message
@@ -262,6 +267,94 @@ export async function sendMessage(
   }
 }
 
+// Stream the mentor's answer over Server-Sent Events, calling onToken for each
+// chunk as it arrives. Resolves with the full response once the server is done.
+export async function streamMessage(
+  message: string | AIMessageRequest,
+  onToken: (text: string) => void,
+  signal?: AbortSignal
+): Promise<string> {
+  const token = getToken();
+
+  if (!token) {
+    throw new AIError('No authentication token found. Please log in again.', 'auth');
+  }
+
+  try {
+    const messageRequest: AIMessageRequest = typeof message === 'string'
+      ? { text: message }
+      : message;
+
+    validateMessageRequest(messageRequest);
+
+    const response = await fetch(`${API_URL}/api/ai/mentor/stream`, {
+      method: 'POST',
+      headers: {
+        'Content-Type': 'application/json',
+        'Accept': 'text/event-stream',
+        'Authorization': `Bearer ${token}`,
+      },
+      credentials: 'include',
+      body: JSON.stringify(messageRequest),
+      signal,
+    });
+
+    if (!response.ok) {
+      throw await toAIError(response);
+    }
+    if (!response.body) {
+      throw new AIError('Streaming is not supported by this browser', 'unknown');
+    }
+
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = '';
+
+    while (true) {
+      const { value, done } = await reader.read();
+      if (done) break;
+      buffer += decoder.decode(value, { stream: true });
+
+      // Events are separated by a blank line
+      let boundary;
+      while ((boundary = buffer.indexOf('\n\n')) !== -1) {
+        const frame = buffer.slice(0, boundary);
+        buffer = buffer.slice(boundary + 2);
+
+        let event = 'message';
+        let data = '';
+        for (const line of frame.split('\n')) {
+          if (line.startsWith('event:')) event = line.slice(6).trim();
+          else if (line.startsWith('data:')) data += line.slice(5).trim();
+        }
+        if (!data) continue;
+        const payload = JSON.parse(data);
+
+        if (event === 'token') {
+          onToken(payload.text);
+        } else if (event === 'done') {
+          return payload.response;
+        } else if (event === 'error') {
+          throw new AIError(payload.detail || 'Failed to generate response', 'server');
+        }
+      }
+    }
+
+    throw new AIError('Connection closed before the response was complete', 'network');
+  } catch (error) {
+    if (error instanceof AIError) {
+      throw error;
+    }
+    if (error instanceof Error) {
+      if (error.name === 'AbortError') {
+        throw new AIError('Request was cancelled', 'network');
+      }
+      throw new AIError(error.message, 'network');
+    }
+    throw new AIError('An unexpected error occurred', 'unknown');
+  }
+}
+
 export async function clearChatHistory(): Promise<void> {
   const token = getToken();
   